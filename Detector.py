@@ -1,147 +1,344 @@
 import cv2
 import numpy as np
 import os
-from datetime import datetime
-from db_connection import record_recognition
+from db_connection import record_recognition_async, get_recognition_writer
+from create_classifier import (CLASSIFIER_DIR, GALLERY_MODEL_PATH, classifier_manifest_path, load_gallery_labels,
+                               load_manifest)
+from frame_source import open_source
+from face_tracker import FaceTracker
+from face_detection import CASCADE_PATH, detect_faces_scaled, min_detectable_size
+from model_registry import get_cascade, get_recognizer, get_binary_model, get_index
+from snapshot_writer import SnapshotWriter, SNAPSHOT_FACE
+from lbph_model import binary_model_path
+from lbph_index import index_path
+from metrics import metrics
+from preprocess import preprocess_face, preprocess_params
+
+# 识别引擎：OpenCV 的 LBPH 识别器，或 .lbph 二进制模型上的 NumPy 实现（需要先导出二进制模型）
+ENGINE_OPENCV = 'opencv'
+ENGINE_NUMPY = 'numpy'
 
 class Detector:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
+    def __init__(self, detect_scale=1.0, min_face_size=(30, 30), max_face_size=None,
+                 snapshot_mode=SNAPSHOT_FACE, snapshot_cooldown=5.0, use_index=True,
+                 engine=ENGINE_OPENCV):
+        """detect_scale: 检测时的缩放比例（如 0.5 表示在半分辨率上检测，识别仍使用原图）
+        min_face_size / max_face_size: 检测人脸的最小/最大尺寸（原图像素）
+        snapshot_mode: 识别快照保存人脸区域（'face'）还是整帧（'frame'）
+        snapshot_cooldown: 同一人员两次保存快照的最小间隔（秒）
+        use_index: 综合模型有近似最近邻索引时是否使用（False 时总是全量比对）
+        engine: 全量比对使用的识别引擎；默认 OpenCV，直接读取 XML 模型，不依赖 .lbph 是否已导出且为最新；
+            'numpy' 时加载 .lbph 二进制模型（内存映射，不需要解析 XML），一帧多张人脸时批量计算，
+            比逐张调用 OpenCV 更快（见 benchmark.py 的 predict 项）
+        
+        找不到人脸检测器文件时抛出 FileNotFoundError。
+        """
+        if engine not in (ENGINE_OPENCV, ENGINE_NUMPY):
+            raise ValueError(f"未知的识别引擎: {engine}")
+        # 检测器和识别模型从共享缓存获取，重复创建 Detector 不会重新解析模型文件
+        self.face_cascade = get_cascade(CASCADE_PATH)
+        if self.face_cascade is None:
+            raise FileNotFoundError(f"找不到人脸检测器文件 {CASCADE_PATH}")
+        self.detect_scale = detect_scale
+        self.min_face_size = min_face_size
+        self.max_face_size = max_face_size
+        self.snapshot_mode = snapshot_mode
+        self.snapshot_cooldown = snapshot_cooldown
+        self.use_index = use_index
+        self.engine = engine
+        self._snapshot_writer = None
+        
+        smallest = min_detectable_size(detect_scale)
+        if min(min_face_size) < smallest:
+            print(f"提示：检测缩放比例为 {detect_scale} 时，小于 {smallest} 像素的人脸无法检测")
+        
+    def load_recognizer(self, person_name=None):
+        """加载识别模型，返回 (recognizer, label_names)
+        
+        指定 person_name 时加载该人员的单独模型，label_names 为 None；
+        否则加载综合模型，label_names 为标签→姓名映射。
+        """
+        if person_name:
+            classifier_path = f'{CLASSIFIER_DIR}/{person_name}.xml'
+            if not os.path.exists(classifier_path):
+                print(f"错误：找不到 {person_name} 的分类器文件")
+                return None, None
+            label_names = None
+        else:
+            classifier_path = GALLERY_MODEL_PATH
+            if not os.path.exists(classifier_path):
+                print("错误：找不到综合分类器文件，请先训练综合模型")
+                return None, None
+            label_names = load_gallery_labels()
+        
+        # 识别时的人脸预处理须与训练时一致，训练清单记录了训练时的参数
+        manifest = load_manifest(classifier_manifest_path(person_name))
+        if manifest is None:
+            print("警告：找不到模型的训练清单，无法确认训练时的人脸预处理与当前设置一致")
+        elif manifest.get('params', {}).get('preprocess') != preprocess_params():
+            print("错误：模型训练时的人脸预处理与当前设置不一致（或训练于加入预处理之前），请重新训练模型")
+            return None, None
+        
+        # 二进制模型须不旧于 XML；近似最近邻索引（lbph_index.py 生成）建立在二进制模型上，
+        # 存在且不旧于模型时使用，否则按 engine 选择全量比对的实现
+        binary_path = binary_model_path(classifier_path)
+        indexed_path = index_path(binary_path)
+        binary_current = (os.path.exists(binary_path)
+                          and os.path.getmtime(binary_path) >= os.path.getmtime(classifier_path))
+        recognizer = None
+        if (binary_current and self.use_index and os.path.exists(indexed_path)
+                and os.path.getmtime(indexed_path) >= os.path.getmtime(binary_path)):
+            model = get_binary_model(binary_path)
+            if model is not None:
+                recognizer = get_index(indexed_path, model)
+        if recognizer is None and binary_current and self.engine == ENGINE_NUMPY:
+            recognizer = get_binary_model(binary_path)
+        if recognizer is None:
+            recognizer = get_recognizer(classifier_path)
+        
+        return recognizer, label_names
+        
+    def detect(self, gray):
+        """在灰度图中检测人脸（按 detect_scale 缩小后检测），返回原图坐标下的 (x, y, w, h) 列表"""
+        return detect_faces_scaled(
+            self.face_cascade,
+            gray,
+            detect_scale=self.detect_scale,
+            min_size=self.min_face_size,
+            max_size=self.max_face_size
+        )
+        
+    def identify(self, recognizer, label_names, face_roi, person_name=None):
+        """识别一张人脸，返回 (name, confidence)；未识别时 name 为 None"""
+        # 综合模型一次预测即得到最匹配的人员（与训练时相同的预处理，LBP 计算量与人脸大小无关）
+        label, confidence = recognizer.predict(preprocess_face(face_roi))
+        return self._resolve(label, confidence, label_names, person_name)
+    
+    def _resolve(self, label, confidence, label_names, person_name):
+        name = person_name if label_names is None else label_names.get(label)
+        
+        if confidence < 100 and name:  # 置信度阈值
+            return name, confidence
+        return None, confidence
+    
+    def identify_faces(self, recognizer, label_names, face_rois, person_name=None):
+        """识别多张人脸，返回 [(name, confidence), ...]
+        
+        NumPy 引擎和近似最近邻索引一次批量计算所有人脸的距离，
+        OpenCV 识别器则逐张预测。
+        """
+        if len(face_rois) <= 1 or not hasattr(recognizer, 'predict_batch'):
+            return [self.identify(recognizer, label_names, roi, person_name) for roi in face_rois]
+        
+        results = []
+        faces = [preprocess_face(roi) for roi in face_rois]
+        for candidates in recognizer.predict_batch(faces, k=1):
+            label, confidence = candidates[0] if candidates else (-1, float('inf'))
+            results.append(self._resolve(label, confidence, label_names, person_name))
+        return results
+        
+    def recognize_frame(self, frame, recognizer, label_names, person_name=None, tracker=None):
+        """识别一帧中的所有人脸，返回 [((x, y, w, h), name, confidence), ...]
+        
+        传入 tracker 时只在需要时做完整检测，其余帧跟踪已有人脸，
+        每条轨迹只识别一次（未识别的轨迹在下次检测时重新识别）。
+        """
+        # 转换为灰度图
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        if tracker is None:
+            with metrics.stage('detect'):
+                boxes = [tuple(box) for box in self.detect(gray)]
+            face_rois = [gray[y:y+h, x:x+w] for (x, y, w, h) in boxes]
+            with metrics.stage('recognize'):
+                identities = self.identify_faces(recognizer, label_names, face_rois, person_name)
+            return [(box, *identity) for box, identity in zip(boxes, identities)]
+        
+        if tracker.needs_detection():
+            with metrics.stage('detect'):
+                tracker.update(gray, self.detect(gray))
+        else:
+            with metrics.stage('track'):
+                tracker.track(gray)
+        
+        pending = [track for track in tracker.tracks
+                   if track.identity is None or (track.identity[0] is None and track.refreshed)]
+        face_rois = [gray[y:y+h, x:x+w] for (x, y, w, h) in (track.box for track in pending)]
+        with metrics.stage('recognize'):
+            identities = self.identify_faces(recognizer, label_names, face_rois, person_name)
+        for track, identity in zip(pending, identities):
+            track.identity = identity
+        
+        return [(track.box, *track.identity) for track in tracker.tracks]
+        
+    def options(self):
+        """构造参数，用于在其他进程中创建相同配置的 Detector"""
+        return {
+            'detect_scale': self.detect_scale,
+            'min_face_size': self.min_face_size,
+            'max_face_size': self.max_face_size,
+            'snapshot_mode': self.snapshot_mode,
+            'snapshot_cooldown': self.snapshot_cooldown,
+            'use_index': self.use_index,
+            'engine': self.engine,
+        }
+        
+    def recognize_face(self, person_name=None, source=0, display=True, track=False, detect_interval=10,
+                       workers=0):
+        """人脸识别主函数
+        
+        person_name 为空时使用综合模型识别所有人员；source 为摄像头索引、
+        视频文件、图片目录或视频流地址；display=False 时不显示窗口（无界面运行）；
+        track=True 时每 detect_interval 帧检测一次，中间帧跟踪人脸并复用识别结果。
+        workers > 0 时以多进程流水线运行（检测、识别各 workers 个进程，见 pipeline.py），
+        流水线模式下不使用跟踪。
+        """
+        if workers > 0:
+            from pipeline import run_pipeline
+            return run_pipeline(person_name, source, display, detect_workers=workers,
+                                recognize_workers=workers, detector=self)
         
-    def recognize_face(self, person_name):
-        """人脸识别主函数"""
         # 加载训练好的分类器
-        classifier_path = f'data/classifiers/{person_name}.xml'
-        if not os.path.exists(classifier_path):
-            print(f"错误：找不到 {person_name} 的分类器文件")
+        recognizer, label_names = self.load_recognizer(person_name)
+        if recognizer is None:
             return
-            
-        recognizer = cv2.face.LBPHFaceRecognizer_create()
-        recognizer.read(classifier_path)
         
-        # 打开摄像头
-        cap = cv2.VideoCapture(0)
+        # 打开视频源
+        cap = open_source(source)
         
         if not cap.isOpened():
-            print("错误：无法打开摄像头")
+            print(f"错误：无法打开视频源 {source}")
             return
             
-        print(f"开始识别 {person_name}，按 'q' 键退出")
+        print(f"开始识别 {person_name or '所有人员'}，按 'q' 键退出")
+        
+        tracker = FaceTracker(detect_interval) if track else None
+        if hasattr(cap, 'stats'):
+            metrics.register_gauge('source_dropped_frames', lambda: cap.stats()['dropped'])
         
         while True:
-            ret, frame = cap.read()
+            with metrics.stage('capture'):
+                ret, frame = cap.read()
             if not ret:
                 break
-                
-            # 转换为灰度图
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             
-            # 检测人脸
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
+            results = self.recognize_frame(frame, recognizer, label_names, person_name, tracker)
+            with metrics.stage('annotate'):
+                self.annotate_frame(frame, results)
+            metrics.mark_frame()
             
-            for (x, y, w, h) in faces:
-                # 提取人脸区域
-                face_roi = gray[y:y+h, x:x+w]
-                
-                # 进行人脸识别
-                label, confidence = recognizer.predict(face_roi)
-                
-                # 绘制矩形框
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                
-                # 显示识别结果
-                if confidence < 100:  # 置信度阈值
-                    result_text = f"{person_name}: {confidence:.1f}%"
-                    color = (0, 255, 0)  # 绿色
-                    
-                    # 记录识别结果到数据库
-                    record_recognition(1, person_name, confidence)  # 假设用户ID为1
-                    
-                    # 保存识别结果图片
-                    self.save_recognition_result(frame, person_name, confidence)
-                else:
-                    result_text = "Unknown"
-                    color = (0, 0, 255)  # 红色
-                
-                # 在图像上显示文本
-                cv2.putText(frame, result_text, (x, y-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+            if not display:
+                continue
             
             # 显示图像
-            cv2.imshow('Face Recognition', frame)
+            with metrics.stage('display'):
+                cv2.imshow('Face Recognition', frame)
+                key = cv2.waitKey(1) & 0xFF
             
             # 按 'q' 键退出
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if key == ord('q'):
                 break
         
         # 释放资源
+        metrics.register_gauge('source_dropped_frames', None)
         cap.release()
-        cv2.destroyAllWindows()
-        
-    def save_recognition_result(self, frame, person_name, confidence):
-        """保存识别结果图片"""
-        # 创建保存目录
-        save_dir = "recognition_results"
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
+        if display:
+            cv2.destroyAllWindows()
+        
+        self.print_output_stats()
+        self.close()
+        
+    def annotate_frame(self, frame, results):
+        """处理一帧的识别结果：提交快照、记录数据库并在画面上绘制框和文字"""
+        # 先提交快照，保证截取的人脸区域上没有绘制的框和文字
+        for box, name, confidence in results:
+            if name:
+                self.save_recognition_result(frame, name, confidence, box)
+        
+        for (x, y, w, h), name, confidence in results:
+            # 绘制矩形框
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
             
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{save_dir}/{person_name}_{confidence:.1f}_{timestamp}.jpg"
+            # 显示识别结果
+            if name:
+                result_text = f"{name}: {confidence:.1f}%"
+                color = (0, 255, 0)  # 绿色
+                
+                # 记录识别结果到数据库（异步批量写入，不阻塞采集循环）
+                record_recognition_async(1, name, confidence)  # 假设用户ID为1
+            else:
+                result_text = "Unknown"
+                color = (0, 0, 255)  # 红色
+            
+            # 在图像上显示文本
+            cv2.putText(frame, result_text, (x, y-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+        
+    def print_output_stats(self):
+        """输出识别记录和快照的写入统计"""
+        writer_stats = get_recognition_writer().stats()
+        print(f"识别记录：已写入 {writer_stats['written']} 条，待写入 {writer_stats['queue_depth']} 条，"
+              f"丢弃 {writer_stats['dropped']} 条")
+        
+        if self._snapshot_writer is not None:
+            self._snapshot_writer.flush()
+            snapshot_stats = self._snapshot_writer.stats()
+            print(f"识别快照：已保存 {snapshot_stats['saved']} 张，冷却跳过 {snapshot_stats['throttled']} 张，"
+                  f"队列满丢弃 {snapshot_stats['dropped']} 张")
         
-        # 保存图片
-        cv2.imwrite(filename, frame)
-        print(f"识别结果已保存: {filename}")
+    def close(self):
+        """写完剩余的快照并停止后台写入线程（识别会话结束时调用，之后再保存快照会重新创建）"""
+        if self._snapshot_writer is not None:
+            self._snapshot_writer.close()
+            self._snapshot_writer = None
+        
+    def save_recognition_result(self, frame, person_name, confidence, box=None):
+        """保存识别结果图片（后台线程编码写盘，同一人员按冷却时间限流）"""
+        if self._snapshot_writer is None:
+            self._snapshot_writer = SnapshotWriter(mode=self.snapshot_mode, cooldown=self.snapshot_cooldown)
+        
+        return self._snapshot_writer.submit(frame, person_name, confidence, box)
         
     def detect_faces(self, image_path):
         """检测图片中的人脸"""
-        # 读取图片
-        image = cv2.imread(image_path)
-        if image is None:
-            print(f"错误：无法读取图片 {image_path}")
+        gray = self.read_gray(image_path)
+        if gray is None:
             return []
-            
-        # 转换为灰度图
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # 检测人脸
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
-        )
-        
-        return faces
+        return self.detect(gray)
         
-    def extract_face_features(self, image_path):
-        """提取人脸特征"""
-        faces = self.detect_faces(image_path)
-        
-        if len(faces) == 0:
-            return None
-            
-        # 读取图片并转换为灰度图
+    def read_gray(self, image_path):
+        """读取图片并转换为灰度图，读取失败时返回 None"""
         image = cv2.imread(image_path)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if image is None:
+            print(f"错误：无法读取图片 {image_path}")
+            return None
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+    def extract_face_features(self, image_path, all_faces=False):
+        """提取人脸特征（经 preprocess_face 统一预处理的人脸灰度图）
         
-        # 提取第一个检测到的人脸
-        x, y, w, h = faces[0]
-        face_roi = gray[y:y+h, x:x+w]
+        默认返回第一个检测到的人脸，没有人脸时返回 None；
+        all_faces=True 时返回所有人脸 [((x, y, w, h), face_roi), ...]。
+        """
+        gray = self.read_gray(image_path)
+        faces = self.detect(gray) if gray is not None else []
         
-        # 调整大小为统一尺寸
-        face_roi = cv2.resize(face_roi, (100, 100))
+        # 与训练和识别相同的预处理
+        features = [((x, y, w, h), preprocess_face(gray[y:y+h, x:x+w])) for (x, y, w, h) in faces]
         
-        return face_roi
+        if all_faces:
+            return features
+        return features[0][1] if features else None
 
 if __name__ == "__main__":
-    detector = Detector()
+    try:
+        detector = Detector()
+    except FileNotFoundError as e:
+        print(f"错误：{e}")
+        raise SystemExit(1)
     
-    # 示例：识别特定人员
-    person_name = input("请输入要识别的人员姓名: ")
-    detector.recognize_face(person_name)
\ No newline at end of file
+    # 示例：识别特定人员（直接回车则使用综合模型识别所有人员）
+    person_name = input("请输入要识别的人员姓名（留空识别所有人员）: ").strip()
+    detector.recognize_face(person_name or None)
\ No newline at end of file
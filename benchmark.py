@@ -0,0 +1,436 @@
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import db_connection
+from face_detection import CASCADE_PATH, detect_faces_scaled
+from lbph_model import LBPHModel
+
+# 全部基准测试项目
+BENCHMARKS = ('detection', 'predict', 'training', 'database', 'end_to_end')
+
+# 默认规模；--quick 时使用 QUICK_SIZES，便于在 CI 中快速运行
+DEFAULT_SIZES = {
+    'resolutions': [(320, 240), (640, 480), (1280, 720), (1920, 1080)],
+    'detect_scales': [1.0, 0.5],
+    'detection_frames': 30,
+    'gallery_sizes': [100, 1000, 5000],
+    'predict_queries': 20,
+    'training_samples': [50, 150, 300],
+    'database_rows': 5000,
+    'end_to_end_frames': 120,
+    'end_to_end_resolution': (640, 480),
+}
+QUICK_SIZES = {
+    'resolutions': [(320, 240), (640, 480)],
+    'detect_scales': [1.0, 0.5],
+    'detection_frames': 5,
+    'gallery_sizes': [100, 500],
+    'predict_queries': 5,
+    'training_samples': [30, 60],
+    'database_rows': 500,
+    'end_to_end_frames': 20,
+    'end_to_end_resolution': (320, 240),
+}
+
+# 合成人脸样本的尺寸
+FACE_SIZE = (100, 100)
+
+def synthetic_faces(count, rng, identities=None):
+    """生成可复现的合成人脸样本（平滑纹理 + 个体噪声），identities 个身份轮流出现"""
+    identities = identities or count
+    bases = [cv2.GaussianBlur(rng.integers(0, 256, (FACE_SIZE[1] + 10, FACE_SIZE[0] + 10), dtype=np.uint8),
+                              (7, 7), 2) for _ in range(min(identities, count))]
+    faces = []
+    for i in range(count):
+        base = bases[i % len(bases)]
+        dx, dy = rng.integers(0, 10, size=2)
+        face = base[dy:dy + FACE_SIZE[1], dx:dx + FACE_SIZE[0]].astype(np.float32)
+        face = face * rng.uniform(0.85, 1.15) + rng.normal(0, 5, face.shape)
+        faces.append(np.clip(face, 0, 255).astype(np.uint8))
+    return faces
+
+def synthetic_frames(resolution, count, rng, face_image=None):
+    """生成可复现的测试画面；给出 face_image 时在每帧随机位置贴入该人脸"""
+    width, height = resolution
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (15, 15), 5)
+    frames = []
+    for _ in range(count):
+        frame = np.clip(background.astype(np.int16) + rng.integers(-8, 9, background.shape), 0, 255).astype(np.uint8)
+        if face_image is not None:
+            size = min(height, width) // 3
+            face = cv2.resize(face_image, (size, size))
+            x = int(rng.integers(0, width - size + 1))
+            y = int(rng.integers(0, height - size + 1))
+            frame[y:y + size, x:x + size] = face
+        frames.append(frame)
+    return frames
+
+def _timings(function, repeat):
+    """运行 function repeat 次，返回每次耗时（秒）"""
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        result.append(time.perf_counter() - start)
+    return result
+
+def _row(benchmark, params, **metrics):
+    return {'benchmark': benchmark, 'params': params, 'metrics': metrics}
+
+def bench_detection(cascade, sizes, rng, face_image=None):
+    """Haar 人脸检测：不同分辨率、不同检测缩放比例下的帧率"""
+    rows = []
+    for resolution in sizes['resolutions']:
+        frames = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)
+                  for f in synthetic_frames(resolution, sizes['detection_frames'], rng, face_image)]
+        for scale in sizes['detect_scales']:
+            times = _timings(lambda: [detect_faces_scaled(cascade, gray, detect_scale=scale) for gray in frames], 3)
+            best = min(times)
+            rows.append(_row('detection', {'resolution': list(resolution), 'detect_scale': scale},
+                             fps=len(frames) / best,
+                             ms_per_frame=best / len(frames) * 1000))
+    return rows
+
+def bench_predict(sizes, rng):
+    """LBPH 识别：不同训练集大小下 OpenCV 与 NumPy 引擎的单张人脸延迟"""
+    rows = []
+    for gallery_size in sizes['gallery_sizes']:
+        gallery = synthetic_faces(gallery_size, rng, identities=max(1, gallery_size // 10))
+        labels = np.arange(gallery_size) // 10
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.train(gallery, labels)
+        model = LBPHModel.from_recognizer(recognizer)
+        queries = synthetic_faces(sizes['predict_queries'], rng)
+        
+        engines = {
+            'opencv': lambda: [recognizer.predict(q) for q in queries],
+            'numpy': lambda: [model.predict(q) for q in queries],
+            'numpy_batch': lambda: model.predict_batch(queries),
+        }
+        for engine, function in engines.items():
+            times = _timings(function, 3)
+            rows.append(_row('predict', {'gallery_size': gallery_size, 'engine': engine},
+                             ms_per_face=statistics.median(times) / len(queries) * 1000,
+                             min_ms_per_face=min(times) / len(queries) * 1000))
+    return rows
+
+def bench_training(sizes, rng):
+    """create_classifier：不同样本数下的全量训练耗时（在当前工作目录的 data/ 下生成样本）"""
+    from create_classifier import create_classifier
+    
+    rows = []
+    for count in sizes['training_samples']:
+        person = f"bench_{count}"
+        os.makedirs(f"data/{person}", exist_ok=True)
+        for i, face in enumerate(synthetic_faces(count, rng, identities=1)):
+            cv2.imwrite(f"data/{person}/{i + 1}{person}.jpg", face)
+        
+        times = _timings(lambda: create_classifier(person, update_list=False, incremental=False), 1)
+        rows.append(_row('training', {'samples': count},
+                         seconds=times[0],
+                         samples_per_second=count / times[0]))
+        
+        # 删除样本，避免影响之后训练的综合模型
+        shutil.rmtree(f"data/{person}")
+    return rows
+
+def _sqlite_query(query):
+    """把 MySQL 写法的参数占位符和汇总表 upsert 转换为 SQLite 语法"""
+    query = query.replace('%s', '?')
+    if 'ON DUPLICATE KEY UPDATE' in query:
+        query = query.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT (bucket, person_name) DO UPDATE SET')
+        query = re.sub(r'VALUES\((\w+)\)', r'excluded.\1', query).replace('LEAST(', 'MIN(')
+    return query
+
+class _SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+    
+    def execute(self, query, params=()):
+        return self._cursor.execute(_sqlite_query(query), params)
+    
+    def executemany(self, query, rows):
+        return self._cursor.executemany(_sqlite_query(query), rows)
+    
+    def close(self):
+        self._cursor.close()
+
+class _SqliteConnection:
+    """本地 SQLite 替身，提供 db_connection 写入函数用到的连接接口"""
+    
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False,
+                                           detect_types=sqlite3.PARSE_DECLTYPES)
+    
+    def cursor(self):
+        return _SqliteCursor(self._connection.cursor())
+    
+    def prepared_cursor(self, query):
+        return self.cursor()
+    
+    def commit(self):
+        self._connection.commit()
+    
+    def is_connected(self):
+        return True
+    
+    def close(self):
+        self._connection.close()
+
+def _use_stand_in_database(path):
+    """把 db_connection.get_connection 替换为连接本地 SQLite 文件，返回恢复函数
+    
+    期间进程内共享的识别记录写入器也换成新的实例，恢复时先写完并关闭，
+    排队的记录和退出时的 atexit 写入都不会落到真实数据库。
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("""
+    CREATE TABLE IF NOT EXISTS recognition_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        person_name TEXT NOT NULL,
+        recognition_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        confidence REAL
+    )""")
+    for table in db_connection.ROLLUP_TABLES.values():
+        connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket TIMESTAMP NOT NULL,
+            person_name TEXT NOT NULL,
+            recognition_count INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            best_confidence REAL NOT NULL,
+            PRIMARY KEY (bucket, person_name)
+        )""")
+    connection.commit()
+    connection.close()
+    
+    original = db_connection.get_connection
+    original_writer = db_connection._recognition_writer
+    db_connection.get_connection = lambda: _SqliteConnection(path)
+    db_connection._recognition_writer = db_connection.RecognitionWriter()
+    
+    def restore():
+        db_connection._recognition_writer.close()
+        db_connection._recognition_writer = original_writer
+        db_connection.get_connection = original
+    return restore
+
+def bench_database(sizes):
+    """识别记录写入吞吐：逐条 record_recognition 与 RecognitionWriter 批量写入（本地 SQLite 替身）"""
+    count = sizes['database_rows']
+    restore = _use_stand_in_database("bench.sqlite3")
+    rows = []
+    try:
+        sync_count = max(1, count // 10)
+        start = time.perf_counter()
+        for i in range(sync_count):
+            db_connection.record_recognition(1, f"person_{i % 50}", 50.0)
+        elapsed = time.perf_counter() - start
+        rows.append(_row('database', {'mode': 'record_recognition', 'rows': sync_count},
+                         rows_per_second=sync_count / elapsed))
+        
+        writer = db_connection.RecognitionWriter(max_queue=count)
+        start = time.perf_counter()
+        for i in range(count):
+            writer.submit(1, f"person_{i % 50}", 50.0)
+        writer.close(timeout=60.0)
+        elapsed = time.perf_counter() - start
+        stats = writer.stats()
+        rows.append(_row('database', {'mode': 'recognition_writer', 'rows': count},
+                         rows_per_second=stats['written'] / elapsed,
+                         batches=stats['batches'], failed=stats['failed'], dropped=stats['dropped']))
+    finally:
+        restore()
+    return rows
+
+def bench_end_to_end(sizes, rng, face_image=None, workers=2):
+    """端到端帧率：读取视频 → 检测 → 识别 → 绘制/记录，串行与多进程流水线两种模式"""
+    from create_classifier import create_gallery_classifier
+    from Detector import Detector
+    from frame_source import open_source
+    from pipeline import RecognitionPipeline
+    
+    # 训练综合模型：三个合成身份，另加 fixture 人脸（如果提供）
+    for i in range(3):
+        os.makedirs(f"data/e2e_{i}", exist_ok=True)
+        for j, face in enumerate(synthetic_faces(20, rng, identities=1)):
+            cv2.imwrite(f"data/e2e_{i}/{j + 1}e2e_{i}.jpg", face)
+    if face_image is not None:
+        os.makedirs("data/fixture", exist_ok=True)
+        gray = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY) if face_image.ndim == 3 else face_image
+        for j in range(20):
+            cv2.imwrite(f"data/fixture/{j + 1}fixture.jpg", cv2.resize(gray, FACE_SIZE))
+    create_gallery_classifier(incremental=False)
+    
+    # 写入测试视频（MJPG，避免依赖系统编码器）
+    frames = synthetic_frames(sizes['end_to_end_resolution'], sizes['end_to_end_frames'], rng, face_image)
+    width, height = sizes['end_to_end_resolution']
+    video = cv2.VideoWriter("bench.avi", cv2.VideoWriter_fourcc(*'MJPG'), 25, (width, height))
+    for frame in frames:
+        video.write(frame)
+    video.release()
+    
+    detector = Detector()
+    restore = _use_stand_in_database("bench.sqlite3")
+    rows = []
+    try:
+        recognizer, label_names = detector.load_recognizer()
+        
+        cap = open_source("bench.avi")
+        processed = 0
+        faces = 0
+        start = time.perf_counter()
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            results = detector.recognize_frame(frame, recognizer, label_names)
+            detector.annotate_frame(frame, results)
+            processed += 1
+            faces += len(results)
+        elapsed = time.perf_counter() - start
+        cap.release()
+        rows.append(_row('end_to_end', {'mode': 'serial', 'resolution': [width, height]},
+                         fps=processed / elapsed, frames=processed, faces=faces))
+        
+        pipeline = RecognitionPipeline(None, "bench.avi", workers, workers, detector_options=detector.options())
+        processed = 0
+        faces = 0
+        start = time.perf_counter()
+        for frame, results in pipeline.results():
+            detector.annotate_frame(frame, results)
+            processed += 1
+            faces += len(results)
+        elapsed = time.perf_counter() - start
+        rows.append(_row('end_to_end', {'mode': 'pipeline', 'workers': workers, 'resolution': [width, height]},
+                         fps=processed / elapsed, frames=processed, faces=faces))
+    finally:
+        detector.close()
+        restore()
+    return rows
+
+def environment():
+    """运行环境信息，用于判断两次结果是否可比"""
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'opencv_threads': cv2.getNumThreads(),
+    }
+
+def run_benchmarks(selected=BENCHMARKS, quick=False, seed=0, face_image_path=None, workers=2):
+    """运行选定的基准测试，返回报告 {'timestamp', 'environment', 'settings', 'results'}
+    
+    所有测试数据由固定随机种子生成，在临时目录中运行，不读写项目的 data/ 和数据库。
+    """
+    sizes = QUICK_SIZES if quick else DEFAULT_SIZES
+    rng = np.random.default_rng(seed)
+    cascade_path = os.path.abspath(CASCADE_PATH)
+    face_image = cv2.imread(face_image_path) if face_image_path else None
+    if face_image_path and face_image is None:
+        print(f"错误：无法读取人脸图片 {face_image_path}")
+    
+    results = []
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="face_bench_") as workdir:
+        os.makedirs(os.path.join(workdir, "data", "classifiers"))
+        has_cascade = os.path.exists(cascade_path)
+        if has_cascade:
+            shutil.copy(cascade_path, os.path.join(workdir, CASCADE_PATH))
+        os.chdir(workdir)
+        try:
+            for name in selected:
+                if name in ('detection', 'end_to_end') and not has_cascade:
+                    print(f"跳过 {name}：找不到人脸检测器文件 {CASCADE_PATH}")
+                    continue
+                print(f"运行基准测试: {name}")
+                if name == 'detection':
+                    results += bench_detection(cv2.CascadeClassifier(CASCADE_PATH), sizes, rng, face_image)
+                elif name == 'predict':
+                    results += bench_predict(sizes, rng)
+                elif name == 'training':
+                    results += bench_training(sizes, rng)
+                elif name == 'database':
+                    results += bench_database(sizes)
+                elif name == 'end_to_end':
+                    results += bench_end_to_end(sizes, rng, face_image, workers)
+        finally:
+            os.chdir(original_cwd)
+    
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'quick': quick, 'seed': seed, 'face_image': face_image_path, 'workers': workers},
+        'results': results,
+    }
+
+def compare_reports(baseline, current):
+    """对比两份报告，返回 [(benchmark, params, metric, 基准值, 当前值, 变化比例), ...]"""
+    def key(row):
+        return row['benchmark'], json.dumps(row['params'], sort_keys=True)
+    
+    previous = {key(row): row for row in baseline['results']}
+    changes = []
+    for row in current['results']:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        for metric, value in row['metrics'].items():
+            old_value = old['metrics'].get(metric)
+            if isinstance(value, (int, float)) and isinstance(old_value, (int, float)) and old_value:
+                changes.append((row['benchmark'], row['params'], metric, old_value, value,
+                                (value - old_value) / old_value))
+    return changes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="人脸识别系统性能基准测试（不需要摄像头和数据库）")
+    parser.add_argument('benchmarks', nargs='*', help=f"要运行的项目（默认全部）：{', '.join(BENCHMARKS)}")
+    parser.add_argument('-o', '--output', help="结果 JSON 文件（默认输出到标准输出）")
+    parser.add_argument('--compare', help="与之前的结果 JSON 对比")
+    parser.add_argument('--quick', action='store_true', help="使用较小规模快速运行")
+    parser.add_argument('--seed', type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument('--face-image', help="贴入测试画面的真实人脸图片（裁剪到人脸区域，使检测和识别有结果）")
+    parser.add_argument('--workers', type=int, default=2, help="端到端流水线模式的每阶段进程数")
+    args = parser.parse_args(argv)
+    
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准测试项目: {', '.join(unknown)}")
+    
+    report = run_benchmarks(args.benchmarks or BENCHMARKS, args.quick, args.seed, args.face_image, args.workers)
+    
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"结果已保存到: {args.output}")
+    else:
+        print(text)
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for benchmark, params, metric, old_value, value, change in compare_reports(baseline, report):
+            print(f"{benchmark:<12} {json.dumps(params, ensure_ascii=False):<50} {metric:<18} "
+                  f"{old_value:>12.3f} → {value:>12.3f} ({change:+.1%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
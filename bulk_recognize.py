@@ -0,0 +1,349 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+
+import cv2
+
+from frame_source import IMAGE_EXTENSIONS
+
+# 视频文件扩展名
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv')
+
+# 进度文件扩展名（记录已完成的图片/视频片段及对应的输出文件长度）
+PROGRESS_EXT = '.progress'
+
+# 失败单元列表扩展名（每次运行重新生成；失败的单元不计入进度，继续运行时会重试）
+ERRORS_EXT = '.errors'
+
+# CSV 输出列
+CSV_FIELDS = ['source', 'frame', 'x', 'y', 'w', 'h', 'name', 'distance']
+
+# 每个工作进程同时排队的任务数
+TASKS_PER_WORKER = 4
+
+_detector = None
+_recognizer = None
+_label_names = None
+_person_name = None
+
+def iter_inputs(paths):
+    """遍历输入路径（目录递归），依次返回 ('image' | 'video', 路径)"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    kind = _input_kind(filename)
+                    if kind:
+                        yield kind, os.path.join(root, filename)
+        elif os.path.isfile(path):
+            kind = _input_kind(path)
+            if kind:
+                yield kind, path
+            else:
+                print(f"跳过不支持的文件: {path}")
+        else:
+            print(f"错误：找不到 {path}")
+
+def _input_kind(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    return None
+
+def video_segments(path, segment_frames):
+    """把视频按帧数切分为可并行处理的片段 [(start, stop), ...]；帧数未知时整段处理"""
+    cap = cv2.VideoCapture(path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    cap.release()
+    if count <= 0 or segment_frames <= 0:
+        return [(0, None)]
+    return [(start, min(start + segment_frames, count)) for start in range(0, count, segment_frames)]
+
+def _video_unit(path, start, stop):
+    return f"{path}#{start}-{'' if stop is None else stop}"
+
+def _init_worker(person_name, detector_options):
+    global _detector, _recognizer, _label_names, _person_name
+    from Detector import Detector
+    
+    cv2.setNumThreads(1)
+    _detector = Detector(**detector_options)
+    _recognizer, _label_names = _detector.load_recognizer(person_name)
+    _person_name = person_name
+
+def _recognize_gray(gray):
+    boxes = [tuple(int(v) for v in box) for box in _detector.detect(gray)]
+    face_rois = [gray[y:y+h, x:x+w] for (x, y, w, h) in boxes]
+    identities = _detector.identify_faces(_recognizer, _label_names, face_rois, _person_name)
+    return [(box, name, confidence) for box, (name, confidence) in zip(boxes, identities)]
+
+def _record(source, frame, box, name, distance):
+    x, y, w, h = box
+    return {'source': source, 'frame': frame, 'x': x, 'y': y, 'w': w, 'h': h,
+            'name': name, 'distance': round(float(distance), 4)}
+
+def _process_images(paths):
+    """工作进程：识别一组图片，返回 [(unit, records, error), ...]"""
+    results = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            results.append((path, [], "无法读取图片"))
+            continue
+        records = [_record(path, None, box, name, distance) for box, name, distance in _recognize_gray(image)]
+        results.append((path, records, None))
+    return results
+
+def _process_video(path, start, stop, frame_step):
+    """工作进程：识别视频中 [start, stop) 范围内每 frame_step 帧中的一帧"""
+    unit = _video_unit(path, start, stop)
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return [(unit, [], "无法打开视频")]
+    
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    
+    records = []
+    index = start
+    while stop is None or index < stop:
+        if index % frame_step:
+            # 跳过的帧只解封装不解码
+            if not cap.grab():
+                break
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            records.extend(_record(path, index, box, name, distance) for box, name, distance in _recognize_gray(gray))
+        index += 1
+    
+    cap.release()
+    return [(unit, records, None)]
+
+class ResultWriter:
+    """流式写入识别结果（JSONL 或 CSV），并记录进度以便中断后继续
+    
+    每完成一个单元（一张图片或一个视频片段）就把该单元的结果写入输出文件，
+    再在进度文件中记录单元标识和写入后的文件长度。继续运行时先把输出文件截断到
+    最后一条进度记录的位置，丢弃中断时写了一半的单元，再跳过已完成的单元。
+    失败的单元只记录到失败列表文件，不计入进度，下次继续运行时重试。
+    """
+    
+    def __init__(self, output_path, output_format=None, resume=True):
+        self.output_path = output_path
+        self.progress_path = output_path + PROGRESS_EXT
+        self.errors_path = output_path + ERRORS_EXT
+        self.format = output_format or ('csv' if output_path.lower().endswith('.csv') else 'jsonl')
+        if self.format not in ('jsonl', 'csv'):
+            raise ValueError(f"不支持的输出格式: {self.format}")
+        
+        self.completed = set()
+        offset = 0
+        if resume and os.path.exists(self.progress_path) and os.path.exists(output_path):
+            offset = self._load_progress()
+        else:
+            for path in (output_path, self.progress_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        directory = os.path.dirname(output_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        self._file = open(output_path, 'a+', encoding='utf-8', newline='')
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self._progress = open(self.progress_path, 'a', encoding='utf-8')
+        self._errors = None
+        self.failed = []
+        if os.path.exists(self.errors_path):
+            os.remove(self.errors_path)
+        self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS) if self.format == 'csv' else None
+        if self._csv is not None and offset == 0:
+            self._csv.writeheader()
+            self._file.flush()
+    
+    def _load_progress(self):
+        offset = 0
+        with open(self.progress_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # 中断时写了一半的进度记录
+                position, _, unit = line.rstrip('\n').partition('\t')
+                offset = int(position)
+                self.completed.add(unit)
+        return offset
+    
+    def write(self, unit, records):
+        """写入一个单元的全部结果并记录进度"""
+        if self._csv is not None:
+            self._csv.writerows(records)
+        else:
+            for record in records:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._progress.write(f"{self._file.tell()}\t{unit}\n")
+        self._progress.flush()
+        self.completed.add(unit)
+    
+    def fail(self, unit, error):
+        """记录一个失败的单元（不写入进度，继续运行时重试）"""
+        if self._errors is None:
+            self._errors = open(self.errors_path, 'w', encoding='utf-8')
+        self._errors.write(f"{unit}\t{error}\n")
+        self._errors.flush()
+        self.failed.append(unit)
+    
+    def close(self):
+        self._file.close()
+        self._progress.close()
+        if self._errors is not None:
+            self._errors.close()
+
+def bulk_recognize(inputs, output_path, person_name=None, workers=None, output_format=None,
+                   resume=True, frame_step=1, segment_frames=1500, chunk_size=32, detector_options=None):
+    """批量识别图片目录和视频文件中的所有人脸，结果流式写入 output_path
+    
+    返回统计信息 {'units', 'skipped', 'faces', 'errors', 'failed', 'elapsed'}，failed 为失败单元列表
+    （同时写入 output_path + ERRORS_EXT，继续运行时重试）；人脸检测器或识别模型不存在时返回 None。
+    """
+    from Detector import Detector
+    
+    detector_options = detector_options or {}
+    try:
+        detector = Detector(**detector_options)
+    except FileNotFoundError as e:
+        print(f"错误：{e}")
+        return None
+    if detector.load_recognizer(person_name)[0] is None:
+        return None
+    
+    writer = ResultWriter(output_path, output_format, resume)
+    workers = workers or os.cpu_count() or 1
+    stats = {'units': 0, 'skipped': 0, 'faces': 0, 'errors': 0}
+    if writer.completed:
+        print(f"从上次中断处继续，已完成 {len(writer.completed)} 个单元")
+    
+    def tasks():
+        chunk = []
+        for kind, path in iter_inputs(inputs):
+            if kind == 'image':
+                if path in writer.completed:
+                    stats['skipped'] += 1
+                    continue
+                chunk.append(path)
+                if len(chunk) >= chunk_size:
+                    yield _process_images, (chunk,), chunk
+                    chunk = []
+            else:
+                for start, stop in video_segments(path, segment_frames):
+                    unit = _video_unit(path, start, stop)
+                    if unit in writer.completed:
+                        stats['skipped'] += 1
+                        continue
+                    yield _process_video, (path, start, stop, frame_step), [unit]
+        if chunk:
+            yield _process_images, (chunk,), chunk
+    
+    def record(unit, records, error):
+        stats['units'] += 1
+        if error:
+            print(f"错误：{unit}: {error}")
+            stats['errors'] += 1
+            writer.fail(unit, error)
+            return
+        writer.write(unit, records)
+        stats['faces'] += len(records)
+    
+    start_time = time.perf_counter()
+    last_report = start_time
+    pending = {}
+    task_iter = tasks()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(person_name, detector_options)) as executor:
+            while True:
+                # 提交的任务数有上限，海量输入时不会一次性占满内存
+                for function, args, units in task_iter:
+                    try:
+                        pending[executor.submit(function, *args)] = units
+                    except BrokenExecutor as e:
+                        # 进程池已失效，剩余任务记为失败，下次继续运行时重试
+                        for unit in units:
+                            record(unit, [], f"进程池已失效: {e}")
+                        continue
+                    if len(pending) >= workers * TASKS_PER_WORKER:
+                        break
+                if not pending:
+                    break
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    units = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # 工作进程崩溃（BrokenProcessPool）或结果无法序列化等，整个任务的单元都记为失败
+                        results = [(unit, [], f"{type(e).__name__}: {e}") for unit in units]
+                    for unit, records, error in results:
+                        record(unit, records, error)
+                
+                now = time.perf_counter()
+                if now - last_report >= 10:
+                    last_report = now
+                    print(f"已处理 {stats['units']} 个单元，{stats['faces']} 张人脸，"
+                          f"{stats['units'] / (now - start_time):.1f} 单元/秒")
+    finally:
+        writer.close()
+    
+    stats['failed'] = writer.failed
+    stats['elapsed'] = time.perf_counter() - start_time
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量识别图片目录和视频文件中的人脸")
+    parser.add_argument('inputs', nargs='+', help="图片文件、视频文件或目录（递归）")
+    parser.add_argument('-o', '--output', required=True, help="输出文件（.jsonl 或 .csv）")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help="输出格式（默认按扩展名）")
+    parser.add_argument('--person', help="只用该人员的单独模型识别（默认使用综合模型）")
+    parser.add_argument('-j', '--workers', type=int, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument('--frame-step', type=int, default=1, help="视频每隔多少帧识别一帧")
+    parser.add_argument('--segment-frames', type=int, default=1500, help="视频切分为并行片段的帧数")
+    parser.add_argument('--chunk-size', type=int, default=32, help="每个任务包含的图片数")
+    parser.add_argument('--detect-scale', type=float, default=1.0, help="检测时的缩放比例")
+    parser.add_argument('--engine', choices=('opencv', 'numpy'), default='opencv',
+                        help="识别引擎（numpy 使用 .lbph 二进制模型批量计算）")
+    parser.add_argument('--restart', action='store_true', help="忽略已有进度，重新开始")
+    args = parser.parse_args(argv)
+    
+    stats = bulk_recognize(
+        args.inputs, args.output,
+        person_name=args.person,
+        workers=args.workers,
+        output_format=args.format,
+        resume=not args.restart,
+        frame_step=max(1, args.frame_step),
+        segment_frames=args.segment_frames,
+        chunk_size=max(1, args.chunk_size),
+        detector_options={'detect_scale': args.detect_scale, 'engine': args.engine},
+    )
+    if stats is None:
+        return 1
+    
+    print(f"完成：处理 {stats['units']} 个单元（跳过已完成 {stats['skipped']} 个），"
+          f"识别 {stats['faces']} 张人脸，失败 {stats['errors']} 个，耗时 {stats['elapsed']:.1f} 秒")
+    if stats['failed']:
+        print(f"失败的单元已列在 {args.output}{ERRORS_EXT}，不加 --restart 重新运行即可重试")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+
+from dataset_store import FACE_SIZE, normalize_crop
+
+# 采集门限默认值
+MIN_FACE_SIZE = 80          # 人脸框最短边（原图像素）
+BLUR_THRESHOLD = 100.0      # 统一尺寸后拉普拉斯方差低于该值视为模糊
+DUPLICATE_DISTANCE = 6      # 与已保存人脸的 dHash 汉明距离不超过该值视为重复
+
+# 姿态分桶：特征（边缘能量）水平重心相对人脸中心的偏移超过该比例视为侧脸
+POSE_OFFSET = 0.025
+
+# 连续多少张人脸因分桶已满被拒绝后放宽限额（姿态和光照没有变化，无法再进入新的桶）
+BUCKET_PATIENCE = 50
+
+# 光照分桶：平均亮度分界
+LIGHTING_LEVELS = (85, 170)
+
+POSE_NAMES = ('左侧', '正面', '右侧')
+LIGHTING_NAMES = ('偏暗', '正常', '偏亮')
+
+# 拒绝原因
+TOO_SMALL = 'too_small'
+BLURRY = 'blurry'
+DUPLICATE = 'duplicate'
+BUCKET_FULL = 'bucket_full'
+
+REJECT_MESSAGES = {
+    TOO_SMALL: '人脸太小，请靠近摄像头',
+    BLURRY: '画面模糊，请保持不动',
+    DUPLICATE: '与已采集的人脸过于相似',
+    BUCKET_FULL: '当前角度/光照已采集足够，请转动头部或改变光照',
+}
+
+def sharpness(face):
+    """清晰度：拉普拉斯响应的方差"""
+    return float(cv2.Laplacian(face, cv2.CV_64F).var())
+
+def dhash(face):
+    """64 位差值感知哈希（相邻像素亮度比较）"""
+    small = cv2.resize(face, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).reshape(-1)
+    return int(np.packbits(bits).view('>u8')[0])
+
+def pose_bucket(face):
+    """粗略的左右姿态：转头时五官的边缘能量会偏向人脸框的一侧"""
+    gx = cv2.Sobel(face, cv2.CV_32F, 1, 0)
+    gy = cv2.Sobel(face, cv2.CV_32F, 0, 1)
+    energy = np.abs(gx) + np.abs(gy)
+    total = float(energy.sum())
+    if total <= 0:
+        return 1
+    columns = np.arange(face.shape[1], dtype=np.float64)
+    offset = float(energy.sum(axis=0) @ columns) / total / face.shape[1] - 0.5
+    if offset < -POSE_OFFSET:
+        return 0
+    if offset > POSE_OFFSET:
+        return 2
+    return 1
+
+def lighting_bucket(face):
+    mean = float(face.mean())
+    return int(np.searchsorted(LIGHTING_LEVELS, mean, side='right'))
+
+class CaptureGate:
+    """采集时筛选人脸：拒绝过小、模糊和与已保存人脸近似重复的人脸，并按姿态和光照分桶限额
+    
+    每个（姿态, 光照）桶最多保存 max_faces * bucket_share 张，
+    正对摄像头不动时很快达到限额，需要转动头部或改变光照才能继续采集。
+    连续 patience 张人脸因分桶已满被拒绝时，把限额放宽到已出现过的桶足以采满 max_faces 张，
+    光照不变等只能进入少数几个桶的场景也能采集完成。
+    """
+    
+    def __init__(self, max_faces=100, min_face_size=MIN_FACE_SIZE, blur_threshold=BLUR_THRESHOLD,
+                 duplicate_distance=DUPLICATE_DISTANCE, bucket_share=0.25, face_size=FACE_SIZE,
+                 patience=BUCKET_PATIENCE):
+        self.max_faces = max_faces
+        self.min_face_size = min_face_size
+        self.blur_threshold = blur_threshold
+        self.duplicate_distance = duplicate_distance
+        self.bucket_quota = max(1, int(np.ceil(max_faces * bucket_share)))
+        self.face_size = face_size
+        self.patience = patience
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._buckets = np.zeros((len(POSE_NAMES), len(LIGHTING_NAMES)), dtype=np.int64)
+        self._seen = np.zeros(self._buckets.shape, dtype=bool)
+        self._full_streak = 0
+        self._rejected = {reason: 0 for reason in REJECT_MESSAGES}
+    
+    def check(self, face_gray):
+        """判断是否保存这张人脸：通过时记录并返回 None，否则返回拒绝原因"""
+        if min(face_gray.shape[:2]) < self.min_face_size:
+            return self._reject(TOO_SMALL)
+        
+        face = normalize_crop(face_gray, self.face_size)
+        if sharpness(face) < self.blur_threshold:
+            return self._reject(BLURRY)
+        
+        face_hash = dhash(face)
+        if self._is_duplicate(face_hash):
+            return self._reject(DUPLICATE)
+        
+        bucket = (pose_bucket(face), lighting_bucket(face))
+        self._seen[bucket] = True
+        if self._buckets[bucket] >= self.bucket_quota:
+            self._full_streak += 1
+            if self._full_streak < self.patience or not self._expand_quota():
+                return self._reject(BUCKET_FULL)
+        
+        self._full_streak = 0
+        self._buckets[bucket] += 1
+        self._hashes = np.append(self._hashes, np.uint64(face_hash))
+        return None
+    
+    def record(self, face_gray):
+        """记录一张未经筛选直接保存的人脸（如手动保存），之后的近似重复仍会被拒绝"""
+        face = normalize_crop(face_gray, self.face_size)
+        self._buckets[pose_bucket(face), lighting_bucket(face)] += 1
+        self._hashes = np.append(self._hashes, np.uint64(dhash(face)))
+    
+    def stats(self):
+        """返回已保存数、当前每桶限额、各原因的拒绝数及各（姿态, 光照）桶的保存数"""
+        return {
+            'accepted': len(self._hashes),
+            'bucket_quota': self.bucket_quota,
+            'rejected': dict(self._rejected),
+            'buckets': {f"{POSE_NAMES[p]}/{LIGHTING_NAMES[l]}": int(self._buckets[p, l])
+                        for p in range(len(POSE_NAMES)) for l in range(len(LIGHTING_NAMES))},
+        }
+    
+    def _expand_quota(self):
+        """已出现过的桶都已满时放宽限额，返回是否放宽"""
+        if (self._buckets[self._seen] < self.bucket_quota).any():
+            return False
+        reachable = int(self._seen.sum())
+        self.bucket_quota = max(self.bucket_quota + 1, int(np.ceil(self.max_faces / reachable)))
+        return True
+    
+    def _is_duplicate(self, face_hash):
+        if not len(self._hashes):
+            return False
+        xor = self._hashes ^ np.uint64(face_hash)
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        return bool(distances.min() <= self.duplicate_distance)
+    
+    def _reject(self, reason):
+        self._rejected[reason] += 1
+        return reason
@@ -1,10 +1,249 @@
 import cv2
 import numpy as np
 import os
+import io
+import json
+import hashlib
+import time
+import traceback
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
+from dataset_store import PACKED_FILENAME, has_packed_store, open_packed_store
+from lbph_model import binary_model_path, export_recognizer
+from preprocess import FaceCache, preprocess_face, preprocess_params
 
-def create_classifier(person_name):
-    """创建人脸分类器"""
+# 分类器目录
+CLASSIFIER_DIR = "data/classifiers"
+
+# 综合模型（所有人员共用一个LBPH模型）及其标签→姓名映射
+GALLERY_MODEL_PATH = f"{CLASSIFIER_DIR}/gallery.xml"
+GALLERY_LABELS_PATH = f"{CLASSIFIER_DIR}/gallery_labels.json"
+GALLERY_MANIFEST_PATH = f"{CLASSIFIER_DIR}/gallery.manifest.json"
+
+# data/ 下不属于人员数据的目录
+RESERVED_DIRS = {"classifiers"}
+
+# LBPH 参数（修改后，已有模型会在下次训练时全量重训）
+LBPH_PARAMS = {'radius': 1, 'neighbors': 8, 'grid_x': 8, 'grid_y': 8}
+
+# 训练后同时导出可内存映射的二进制模型（.lbph），识别时优先加载；
+# 直方图存储类型见 lbph_model.HISTOGRAM_DTYPES
+EXPORT_BINARY_MODEL = True
+BINARY_MODEL_DTYPE = 'float32'
+
+def create_recognizer():
+    """按 LBPH_PARAMS 创建LBPH人脸识别器"""
+    return cv2.face.LBPHFaceRecognizer_create(**LBPH_PARAMS)
+
+def save_recognizer(recognizer, path, names=None):
+    """保存识别模型（先写临时文件再替换，正在使用该模型的进程不会读到半个文件）
+    
+    EXPORT_BINARY_MODEL 为 True 时在 XML 之后写出同名 .lbph 二进制模型。
+    """
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{ext}"
+    recognizer.save(tmp_path)
+    os.replace(tmp_path, path)
+    
+    if EXPORT_BINARY_MODEL:
+        export_recognizer(recognizer, binary_model_path(path), names, BINARY_MODEL_DTYPE)
+
+def training_params():
+    """所有影响模型内容的参数，与训练清单中记录的不一致时需要全量重训"""
+    return {'lbph': dict(LBPH_PARAMS), 'preprocess': preprocess_params()}
+
+def list_persons(data_dir="data"):
+    """获取所有人员数据目录"""
+    if not os.path.exists(data_dir):
+        return []
+    
+    return sorted(d for d in os.listdir(data_dir)
+                  if os.path.isdir(os.path.join(data_dir, d)) and d not in RESERVED_DIRS)
+
+def list_image_files(person_name):
+    """获取某个人员目录中的全部图片文件名"""
+    data_path = f"data/{person_name}"
+    if not os.path.exists(data_path):
+        return []
+    
+    return sorted(f for f in os.listdir(data_path) if f.endswith('.jpg') or f.endswith('.png'))
+
+def packed_sample_key(index):
+    """打包存储中第 index 张人脸的样本键"""
+    return f"{PACKED_FILENAME}#{index}"
+
+def packed_sample_hashes(person_name):
+    """读取某个人员打包存储中每张人脸的哈希，没有打包存储时返回空列表"""
+    if not has_packed_store(person_name):
+        return []
+    
+    try:
+        with open_packed_store(person_name) as store:
+            return store.hashes()
+    except ImportError as e:
+        print(f"警告：跳过 {person_name} 的打包数据（{e}）")
+        return []
+
+def load_person_images(person_name, filenames=None):
+    """加载某个人员的人脸图片（灰度），filenames 为空时加载全部
+    
+    filenames 中形如 faces.h5#<序号> 的样本从打包存储中批量读取，无需逐张解码。
+    """
+    data_path = f"data/{person_name}"
+    images = []
+    
+    if filenames is None:
+        filenames = list_image_files(person_name)
+        filenames += [packed_sample_key(i) for i in range(len(packed_sample_hashes(person_name)))]
+    
+    packed_keys = []
+    
+    for filename in filenames:
+        if filename.startswith(f"{PACKED_FILENAME}#"):
+            packed_keys.append(filename)
+            continue
+        image_path = os.path.join(data_path, filename)
+        image = Image.open(image_path).convert('L')
+        images.append((filename, np.array(image, 'uint8')))
+    
+    if packed_keys:
+        with open_packed_store(person_name) as store:
+            faces = store.faces()
+            for key in packed_keys:
+                images.append((key, np.array(faces[int(key.split('#', 1)[1])])))
+    
+    return images
+
+def load_training_faces(person_name, filenames, samples, prefix=''):
+    """加载预处理后的训练人脸（见 preprocess.py），返回与 filenames 对应的列表
+    
+    预处理结果按样本哈希缓存，未变化的样本重新训练时不再解码和预处理。
+    samples 为 scan_samples() 的结果，样本键为 prefix + 文件名。
+    """
+    hashes = [samples[prefix + filename]['hash'] for filename in filenames]
+    
+    def load_images(positions):
+        return [image for _, image in load_person_images(person_name, [filenames[i] for i in positions])]
+    
+    return FaceCache().load(hashes, load_images)
+
+def file_label(filename):
+    """从文件名中提取ID作为单人模型的标签（假设文件名格式为：数字+姓名.jpg）"""
+    try:
+        # 提取文件名中的数字部分作为ID
+        return int(''.join(filter(str.isdigit, filename.split('.')[0])))
+    except:
+        return 1  # 默认ID
+
+def load_gallery_labels(labels_path=GALLERY_LABELS_PATH):
+    """读取综合模型的标签→姓名映射"""
+    if not os.path.exists(labels_path):
+        return {}
+    
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        return {int(label): name for label, name in json.load(f).items()}
+
+def save_json(path, data):
+    """写入JSON文件（先写临时文件再替换，避免中断时留下半个文件）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def file_hash(path):
+    """计算文件内容的SHA-1"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_samples(person_name, previous=None, prefix=''):
+    """列出某个人员的训练样本，返回 {样本键: {'hash', 'size', 'mtime_ns'}}
+    
+    样本键为 prefix + 文件名；大小和修改时间与 previous（上次的清单）一致的文件
+    直接复用记录的哈希，不再重新读取。
+    """
+    previous = previous or {}
+    samples = {}
+    
+    for filename in list_image_files(person_name):
+        key = prefix + filename
+        stat = os.stat(os.path.join(f"data/{person_name}", filename))
+        old = previous.get(key)
+        if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+            digest = old['hash']
+        else:
+            digest = file_hash(os.path.join(f"data/{person_name}", filename))
+        samples[key] = {'hash': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    
+    # 打包存储中的人脸在采集时已记录哈希，直接读取
+    for index, digest in enumerate(packed_sample_hashes(person_name)):
+        samples[prefix + packed_sample_key(index)] = {'hash': digest}
+    
+    return samples
+
+def classifier_manifest_path(person_name=None):
+    """人员单独模型（person_name 为空时为综合模型）的训练清单路径"""
+    if person_name:
+        return f"{CLASSIFIER_DIR}/{person_name}.manifest.json"
+    return GALLERY_MANIFEST_PATH
+
+def load_manifest(manifest_path):
+    """读取训练清单，不存在或损坏时返回 None"""
+    if not os.path.exists(manifest_path):
+        return None
+    
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def prune_face_cache():
+    """删除不再被任何训练清单引用的预处理缓存（样本已删除或预处理参数已变化）"""
+    if not os.path.isdir(CLASSIFIER_DIR):
+        return 0
+    
+    hashes = set()
+    for name in os.listdir(CLASSIFIER_DIR):
+        if name.endswith('.manifest.json'):
+            manifest = load_manifest(os.path.join(CLASSIFIER_DIR, name))
+            if manifest:
+                hashes.update(info['hash'] for info in manifest.get('samples', {}).values())
+    
+    removed = FaceCache().prune(hashes)
+    if removed:
+        print(f"清理预处理缓存 {removed} 个文件")
+    return removed
+
+def plan_update(model_path, manifest, samples):
+    """比较训练清单与当前样本
+    
+    返回需要追加到模型中的样本键列表（空列表表示模型已是最新）；
+    返回 None 表示需要全量重训：模型或清单不存在、参数变化、或有样本被删除/修改。
+    """
+    if manifest is None or not os.path.exists(model_path):
+        return None
+    if manifest.get('params') != training_params():
+        return None
+    
+    trained = manifest.get('samples', {})
+    for key, info in trained.items():
+        current = samples.get(key)
+        if current is None or current['hash'] != info['hash']:
+            return None
+    
+    return [key for key in samples if key not in trained]
+
+def create_classifier(person_name, update_list=True, incremental=True):
+    """创建人脸分类器
+    
+    incremental=True 时根据训练清单只把新增图片通过 update() 加入已有模型，
+    只有图片被删除/修改或参数变化时才全量重训。
+    update_list=False 时不更新分类器列表文件，供并行训练使用。
+    """
     # 数据路径
     data_path = f"data/{person_name}"
     
@@ -13,57 +252,134 @@ def create_classifier(person_name):
         return False
     
     # 创建分类器保存目录
-    classifier_dir = "data/classifiers"
+    classifier_dir = CLASSIFIER_DIR
     if not os.path.exists(classifier_dir):
         os.makedirs(classifier_dir)
     
-    # 准备训练数据
-    faces = []
-    labels = []
-    
-    print(f"正在加载 {person_name} 的训练数据...")
+    classifier_path = f"{classifier_dir}/{person_name}.xml"
+    manifest_path = classifier_manifest_path(person_name)
     
-    # 遍历数据目录中的所有图片
-    for filename in os.listdir(data_path):
-        if filename.endswith('.jpg') or filename.endswith('.png'):
-            image_path = os.path.join(data_path, filename)
-            
-            # 读取图片并转换为灰度图
-            image = Image.open(image_path).convert('L')
-            image_np = np.array(image, 'uint8')
-            
-            # 从文件名中提取ID（假设文件名格式为：数字+姓名.jpg）
-            try:
-                # 提取文件名中的数字部分作为ID
-                file_id = int(''.join(filter(str.isdigit, filename.split('.')[0])))
-            except:
-                file_id = 1  # 默认ID
-            
-            faces.append(image_np)
-            labels.append(file_id)
+    manifest = load_manifest(manifest_path) if incremental else None
+    samples = scan_samples(person_name, manifest.get('samples') if manifest else None)
     
-    if len(faces) == 0:
+    if len(samples) == 0:
         print(f"错误：在 {data_path} 中没有找到有效的图片文件")
         return False
     
-    print(f"加载了 {len(faces)} 张训练图片")
+    new_keys = plan_update(classifier_path, manifest, samples)
+    
+    if new_keys == []:
+        print(f"{person_name} 的分类器已是最新，无需训练")
+    else:
+        print(f"正在加载 {person_name} 的训练数据...")
+        
+        # 准备训练数据
+        filenames = list(samples) if new_keys is None else new_keys
+        faces = load_training_faces(person_name, filenames, samples)
+        labels = [file_label(filename) for filename in filenames]
+        
+        print(f"加载了 {len(faces)} 张训练图片")
+        
+        # 创建LBPH人脸识别器
+        recognizer = create_recognizer()
+        
+        if new_keys is None:
+            print("开始训练分类器...")
+            recognizer.train(faces, np.array(labels))
+        else:
+            print(f"在已有模型上增量加入 {len(faces)} 张新图片...")
+            recognizer.read(classifier_path)
+            recognizer.update(faces, np.array(labels))
+        
+        # 保存分类器及训练清单
+        save_recognizer(recognizer, classifier_path)
+        save_json(manifest_path, {'params': training_params(), 'samples': samples})
+        
+        print(f"分类器训练完成，已保存到: {classifier_path}")
+    
+    # 更新分类器列表；并行训练时由主进程在全部完成后统一清理缓存
+    if update_list:
+        update_classifier_list(person_name)
+        prune_face_cache()
+    
+    return True
+
+def create_gallery_classifier(incremental=True):
+    """创建综合人脸分类器（一个模型覆盖所有已采集人员）
+    
+    incremental=True 时新增图片和新增人员通过 update() 加入已有模型，
+    已有人员的标签保持不变；有图片被删除/修改或参数变化时全量重训。
+    """
+    persons = list_persons()
+    
+    if not persons:
+        print("没有找到人员数据目录")
+        return False
+    
+    if not os.path.exists(CLASSIFIER_DIR):
+        os.makedirs(CLASSIFIER_DIR)
     
-    # 创建LBPH人脸识别器
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    manifest = load_manifest(GALLERY_MANIFEST_PATH) if incremental else None
+    if manifest is not None and not os.path.exists(GALLERY_LABELS_PATH):
+        manifest = None
+    previous = manifest.get('samples') if manifest else None
     
-    print("开始训练分类器...")
+    samples = {}
+    for person in persons:
+        person_samples = scan_samples(person, previous, prefix=f"{person}/")
+        if not person_samples:
+            print(f"跳过 {person}：没有找到有效的图片文件")
+        samples.update(person_samples)
     
-    # 训练分类器
-    recognizer.train(faces, np.array(labels))
+    if len(samples) == 0:
+        print("错误：没有找到有效的训练图片")
+        return False
     
-    # 保存分类器
-    classifier_path = f"{classifier_dir}/{person_name}.xml"
-    recognizer.save(classifier_path)
+    new_keys = plan_update(GALLERY_MODEL_PATH, manifest, samples)
     
-    print(f"分类器训练完成，已保存到: {classifier_path}")
+    if new_keys == []:
+        print("综合分类器已是最新，无需训练")
+        return True
     
-    # 更新分类器列表
-    update_classifier_list(person_name)
+    # 增量更新时沿用已有标签，新人员分配新标签；全量重训时按人员顺序重新编号
+    label_names = load_gallery_labels() if new_keys is not None else {}
+    name_labels = {name: label for label, name in label_names.items()}
+    keys = list(samples) if new_keys is None else new_keys
+    
+    # 按人员分组，每个人员的样本一次读取
+    grouped = {}
+    for key in keys:
+        person, filename = key.split('/', 1)
+        grouped.setdefault(person, []).append(filename)
+    
+    faces = []
+    labels = []
+    for person, filenames in grouped.items():
+        if person not in name_labels:
+            label = max(label_names, default=-1) + 1
+            label_names[label] = person
+            name_labels[person] = label
+        faces.extend(load_training_faces(person, filenames, samples, prefix=f"{person}/"))
+        labels.extend([name_labels[person]] * len(filenames))
+        print(f"加载 {person} 的训练图片 {len(filenames)} 张")
+    
+    recognizer = create_recognizer()
+    if new_keys is None:
+        print(f"开始训练综合分类器（{len(label_names)} 人，{len(faces)} 张图片）...")
+        recognizer.train(faces, np.array(labels))
+    else:
+        print(f"在综合分类器上增量加入 {len(faces)} 张新图片...")
+        recognizer.read(GALLERY_MODEL_PATH)
+        recognizer.update(faces, np.array(labels))
+    
+    save_recognizer(recognizer, GALLERY_MODEL_PATH, label_names)
+    
+    # 保存标签→姓名映射及训练清单
+    save_json(GALLERY_LABELS_PATH, {str(label): name for label, name in label_names.items()})
+    save_json(GALLERY_MANIFEST_PATH, {'params': training_params(), 'samples': samples})
+    
+    print(f"综合分类器训练完成，已保存到: {GALLERY_MODEL_PATH}")
+    prune_face_cache()
     
     return True
 
@@ -88,8 +404,28 @@ def update_classifier_list(person_name):
         
         print(f"已将 {person_name} 添加到分类器列表")
 
-def batch_create_classifiers():
-    """批量创建分类器"""
+def _init_training_worker():
+    """训练子进程初始化：每个进程只用一个 OpenCV 线程，避免多进程下线程数超过核数"""
+    cv2.setNumThreads(1)
+
+def _train_person(person_name):
+    """在子进程中训练一个人员的分类器，返回 (person, success, seconds, log)"""
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            success = create_classifier(person_name, update_list=False)
+    except Exception:
+        success = False
+        log.write(traceback.format_exc())
+    return person_name, success, time.perf_counter() - start, log.getvalue()
+
+def batch_create_classifiers(workers=None):
+    """批量创建分类器
+    
+    workers 为并行训练的进程数，默认等于CPU核数；workers=1 时在当前进程中依次训练。
+    单个人员训练失败不影响其他人员，结束后打印汇总报告并返回汇总信息。
+    """
     data_dir = "data"
     
     if not os.path.exists(data_dir):
@@ -97,25 +433,70 @@ def batch_create_classifiers():
         return
     
     # 获取所有人员目录
-    persons = [d for d in os.listdir(data_dir) 
-              if os.path.isdir(os.path.join(data_dir, d)) and d != "classifiers"]
+    persons = list_persons(data_dir)
     
     if not persons:
         print("没有找到人员数据目录")
         return
     
-    print(f"找到 {len(persons)} 个人员数据目录")
+    workers = max(1, min(workers or os.cpu_count() or 1, len(persons)))
+    print(f"找到 {len(persons)} 个人员数据目录，使用 {workers} 个进程训练")
     
-    for person in persons:
-        print(f"\n正在为 {person} 创建分类器...")
-        success = create_classifier(person)
-        
+    if not os.path.exists(CLASSIFIER_DIR):
+        os.makedirs(CLASSIFIER_DIR)
+    
+    start = time.perf_counter()
+    results = []
+    
+    def report(result):
+        results.append(result)
+        person, success, seconds, _ = result
+        status = "成功" if success else "失败"
+        print(f"[{len(results)}/{len(persons)}] {person} 的分类器创建{status}，用时 {seconds:.1f} 秒")
+    
+    if workers == 1:
+        for person in persons:
+            print(f"\n正在为 {person} 创建分类器...")
+            result = _train_person(person)
+            print(result[3], end='')
+            report(result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_training_worker) as executor:
+            futures = {executor.submit(_train_person, person): person for person in persons}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception:
+                    # 子进程异常退出（如内存不足被杀）时进程池失效，剩余人员都记为失败
+                    result = (futures[future], False, time.perf_counter() - start, traceback.format_exc())
+                report(result)
+    
+    # 分类器列表只在主进程中更新，避免多个进程同时写文件
+    for person, success, _, _ in results:
         if success:
-            print(f"{person} 的分类器创建成功")
-        else:
-            print(f"{person} 的分类器创建失败")
+            update_classifier_list(person)
+    prune_face_cache()
+    
+    elapsed = time.perf_counter() - start
+    succeeded = [r for r in results if r[1]]
+    failed = [r for r in results if not r[1]]
     
     print("\n批量分类器创建完成")
+    print(f"总人数: {len(results)}，成功: {len(succeeded)}，失败: {len(failed)}，总用时: {elapsed:.1f} 秒")
+    if succeeded:
+        slowest = max(succeeded, key=lambda r: r[2])
+        print(f"平均每人用时: {sum(r[2] for r in succeeded) / len(succeeded):.1f} 秒，"
+              f"最慢: {slowest[0]}（{slowest[2]:.1f} 秒）")
+    for person, _, _, log in failed:
+        print(f"\n{person} 训练失败：\n{log.strip()}")
+    
+    return {
+        'total': len(results),
+        'succeeded': [r[0] for r in succeeded],
+        'failed': [r[0] for r in failed],
+        'timings': {r[0]: r[2] for r in results},
+        'elapsed': elapsed,
+    }
 
 def test_classifier(person_name):
     """测试分类器"""
@@ -126,7 +507,7 @@ def test_classifier(person_name):
         return
     
     # 加载分类器
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer = create_recognizer()
     recognizer.read(classifier_path)
     
     # 加载测试图片
@@ -141,25 +522,52 @@ def test_classifier(person_name):
     correct_predictions = 0
     total_predictions = 0
     
-    for filename in os.listdir(test_data_path):
-        if filename.endswith('.jpg') or filename.endswith('.png'):
-            image_path = os.path.join(test_data_path, filename)
-            
-            # 读取并预处理图片
-            image = Image.open(image_path).convert('L')
-            image_np = np.array(image, 'uint8')
-            
-            # 进行预测
-            label, confidence = recognizer.predict(image_np)
+    for filename, image_np in load_person_images(person_name):
+        # 进行预测（与训练时相同的预处理）
+        label, confidence = recognizer.predict(preprocess_face(image_np))
+        
+        total_predictions += 1
+        
+        # 判断预测是否正确（这里简化处理）
+        if confidence < 100:  # 置信度阈值
+            correct_predictions += 1
+            print(f"✓ {filename}: 置信度 {confidence:.2f}")
+        else:
+            print(f"✗ {filename}: 置信度 {confidence:.2f} (未识别)")
+    
+    if total_predictions > 0:
+        accuracy = (correct_predictions / total_predictions) * 100
+        print(f"\n测试结果：")
+        print(f"总测试图片: {total_predictions}")
+        print(f"正确识别: {correct_predictions}")
+        print(f"准确率: {accuracy:.2f}%")
+    else:
+        print("没有找到测试图片")
+
+def test_gallery_classifier():
+    """测试综合分类器（统计身份识别正确率）"""
+    if not os.path.exists(GALLERY_MODEL_PATH):
+        print("错误：找不到综合分类器文件")
+        return
+    
+    recognizer = create_recognizer()
+    recognizer.read(GALLERY_MODEL_PATH)
+    label_names = load_gallery_labels()
+    
+    correct_predictions = 0
+    total_predictions = 0
+    
+    for person in list_persons():
+        for filename, image_np in load_person_images(person):
+            label, confidence = recognizer.predict(preprocess_face(image_np))
+            predicted_name = label_names.get(label, "Unknown")
             
             total_predictions += 1
             
-            # 判断预测是否正确（这里简化处理）
-            if confidence < 100:  # 置信度阈值
+            if confidence < 100 and predicted_name == person:
                 correct_predictions += 1
-                print(f"✓ {filename}: 置信度 {confidence:.2f}")
             else:
-                print(f"✗ {filename}: 置信度 {confidence:.2f} (未识别)")
+                print(f"✗ {person}/{filename}: 识别为 {predicted_name}，置信度 {confidence:.2f}")
     
     if total_predictions > 0:
         accuracy = (correct_predictions / total_predictions) * 100
@@ -175,8 +583,10 @@ if __name__ == "__main__":
     print("1. 训练单个分类器")
     print("2. 批量训练分类器")
     print("3. 测试分类器")
+    print("4. 训练综合分类器（所有人员）")
+    print("5. 测试综合分类器")
     
-    choice = input("请选择操作 (1-3): ").strip()
+    choice = input("请选择操作 (1-5): ").strip()
     
     if choice == '1':
         person_name = input("请输入人员姓名: ").strip()
@@ -186,7 +596,8 @@ if __name__ == "__main__":
             print("姓名不能为空")
     
     elif choice == '2':
-        batch_create_classifiers()
+        workers = input("请输入并行进程数（直接回车使用全部CPU核）: ").strip()
+        batch_create_classifiers(int(workers) if workers.isdigit() else None)
     
     elif choice == '3':
         person_name = input("请输入要测试的人员姓名: ").strip()
@@ -195,5 +606,11 @@ if __name__ == "__main__":
         else:
             print("姓名不能为空")
     
+    elif choice == '4':
+        create_gallery_classifier()
+    
+    elif choice == '5':
+        test_gallery_classifier()
+    
     else:
         print("无效选择")
\ No newline at end of file
@@ -1,27 +1,67 @@
 import cv2
 import os
+from frame_source import open_source
+from face_detection import CASCADE_PATH, detect_faces_scaled
+from model_registry import get_cascade
+from dataset_store import open_packed_store, packed_store_path
+from capture_gate import CaptureGate, REJECT_MESSAGES
 
-def create_dataset(person_name):
-    """创建人脸数据集"""
+def create_dataset(person_name, source=0, display=True, detect_scale=1.0, min_face_size=(30, 30), max_face_size=None,
+                   store='jpg', on_frame=None, max_faces=100, quality_gate=True):
+    """创建人脸数据集
+    
+    source 为摄像头索引、视频文件、图片目录或视频流地址；
+    display=False 时不显示窗口，可直接从录像中批量采集；
+    detect_scale 为检测时的缩放比例，保存的人脸仍从原分辨率图像中截取，
+    min_face_size / max_face_size 以原图像素为单位；
+    store='packed' 时人脸统一缩放后追加到 data/<person>/faces.h5，而不是逐张保存JPEG；
+    on_frame(frame) 在每帧绘制人脸框后调用（用于在界面中显示），返回 False 时结束采集；
+    quality_gate=True 时只自动保存清晰、足够大且与已保存人脸不重复的人脸，并按姿态和光照分桶限额
+    （见 capture_gate.py），采集到 max_faces 张后结束。
+    返回是否成功开始采集（找不到人脸检测器、无法打开视频源或缺少 h5py 时返回 False）。
+    """
     # 创建数据目录
     data_dir = f"data/{person_name}"
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
     
     # 加载人脸检测器
-    face_cascade = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
+    face_cascade = get_cascade(CASCADE_PATH)
+    if face_cascade is None:
+        print(f"错误：找不到人脸检测器文件 {CASCADE_PATH}")
+        return False
     
-    # 打开摄像头
-    cap = cv2.VideoCapture(0)
+    # 打开视频源
+    cap = open_source(source)
     
     if not cap.isOpened():
-        print("错误：无法打开摄像头")
-        return
+        print(f"错误：无法打开视频源 {source}")
+        return False
+    
+    packed_store = None
+    if store == 'packed':
+        try:
+            packed_store = open_packed_store(person_name, 'a')
+        except ImportError as e:
+            print(f"错误：{e}")
+            cap.release()
+            return False
+    
+    def save_face(face_roi, box, count):
+        """保存一张人脸，返回保存位置"""
+        if packed_store is not None:
+            index = packed_store.append(face_roi, box)
+            return f"{packed_store_path(person_name)}#{index}"
+        filename = f"{data_dir}/{count}{person_name}.jpg"
+        cv2.imwrite(filename, face_roi)
+        return filename
     
     print(f"开始采集 {person_name} 的人脸数据")
     print("请面对摄像头，按 's' 键保存图片，按 'q' 键退出")
     
     count = 0
+    gate = CaptureGate(max_faces) if quality_gate else None
+    last_reason = None
     
     while True:
         ret, frame = cap.read()
@@ -32,31 +72,54 @@ def create_dataset(person_name):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # 检测人脸
-        faces = face_cascade.detectMultiScale(
+        faces = detect_faces_scaled(
+            face_cascade,
             gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
+            detect_scale=detect_scale,
+            min_size=min_face_size,
+            max_size=max_face_size
         )
         
         # 绘制人脸框
         for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            
             # 提取人脸区域
             face_roi = gray[y:y+h, x:x+w]
             
+            # 筛选未通过的人脸用橙色框标出原因
+            reason = None
+            if gate is not None:
+                quota = gate.bucket_quota
+                reason = gate.check(face_roi)
+                if gate.bucket_quota > quota:
+                    print(f"长时间没有新的角度/光照，每个分桶的限额放宽到 {gate.bucket_quota} 张")
+            if reason:
+                if reason != last_reason:
+                    print(f"跳过：{REJECT_MESSAGES[reason]}")
+                    last_reason = reason
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 165, 255), 2)
+                cv2.putText(frame, reason, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 2)
+                continue
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+            last_reason = None
+            
             # 自动保存（也可以手动按's'保存）
-            if len(faces) > 0:
-                count += 1
-                filename = f"{data_dir}/{count}{person_name}.jpg"
-                cv2.imwrite(filename, face_roi)
-                print(f"保存图片: {filename}")
-                
-                # 限制采集数量
-                if count >= 300:
-                    print(f"已采集 {count} 张图片，采集完成")
-                    break
+            count += 1
+            filename = save_face(face_roi, (x, y, w, h), count)
+            print(f"保存图片: {filename}")
+            
+            # 限制采集数量
+            if count >= max_faces:
+                print(f"已采集 {count} 张图片，采集完成")
+                break
+        
+        if count >= max_faces:
+            break
+        
+        if on_frame is not None and on_frame(frame) is False:
+            break
+        
+        if not display:
+            continue
         
         # 显示图像
         cv2.imshow('Data Collection', frame)
@@ -69,19 +132,28 @@ def create_dataset(person_name):
             # 手动保存
             for (x, y, w, h) in faces:
                 face_roi = gray[y:y+h, x:x+w]
+                if gate is not None:
+                    gate.record(face_roi)
                 count += 1
-                filename = f"{data_dir}/{count}{person_name}.jpg"
-                cv2.imwrite(filename, face_roi)
+                filename = save_face(face_roi, (x, y, w, h), count)
                 print(f"手动保存图片: {filename}")
     
     # 释放资源
     cap.release()
-    cv2.destroyAllWindows()
+    if display:
+        cv2.destroyAllWindows()
+    if packed_store is not None:
+        packed_store.close()
     
     print(f"数据采集完成，共采集 {count} 张图片")
+    if gate is not None:
+        rejected = gate.stats()['rejected']
+        print(f"筛选跳过：过小 {rejected['too_small']} 张，模糊 {rejected['blurry']} 张，"
+              f"重复 {rejected['duplicate']} 张，角度/光照已足够 {rejected['bucket_full']} 张")
     
     # 更新姓名列表文件
     update_names_list(person_name)
+    return True
 
 def update_names_list(person_name):
     """更新姓名列表文件"""
@@ -0,0 +1,179 @@
+import cv2
+import hashlib
+import numpy as np
+import os
+import time
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# 打包存储的文件名（位于 data/<person>/ 目录下）
+PACKED_FILENAME = "faces.h5"
+
+# 打包存储中人脸的统一尺寸（宽, 高）
+FACE_SIZE = (100, 100)
+
+# 分块大小（每块包含的人脸数）
+CHUNK_FACES = 64
+
+def packed_store_path(person_name):
+    """某个人员的打包存储路径"""
+    return f"data/{person_name}/{PACKED_FILENAME}"
+
+def has_packed_store(person_name):
+    return os.path.exists(packed_store_path(person_name))
+
+def normalize_crop(face_gray, face_size=FACE_SIZE):
+    """把人脸灰度图缩放为统一尺寸"""
+    if face_gray.shape[1] == face_size[0] and face_gray.shape[0] == face_size[1]:
+        return np.ascontiguousarray(face_gray, dtype=np.uint8)
+    return cv2.resize(face_gray, face_size, interpolation=cv2.INTER_AREA)
+
+class PackedFaceStore:
+    """单个人员的打包人脸数据集
+    
+    所有人脸保存在一个 HDF5 文件中：faces 为 N×H×W 的 uint8 数组，
+    hashes / timestamps / boxes 为每张人脸的元数据。采集时以分块方式追加，
+    关闭写入后整理为连续存储，读取时直接内存映射，无需逐张解码图片。
+    """
+    
+    def __init__(self, path, mode='r', face_size=FACE_SIZE):
+        if h5py is None:
+            raise ImportError("打包存储需要安装 h5py")
+        
+        self.path = path
+        self.mode = mode
+        self.face_size = face_size
+        self._pending = []
+        self._mmap = None
+        
+        if mode == 'r':
+            self._file = h5py.File(path, 'r')
+        else:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._file = h5py.File(path, 'a')
+            self._ensure_writable()
+    
+    def __len__(self):
+        return self._file['faces'].shape[0] + len(self._pending) if 'faces' in self._file else 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def append(self, face_gray, box=None, timestamp=None):
+        """追加一张人脸（自动缩放为统一尺寸），返回其序号"""
+        face = normalize_crop(face_gray, self.face_size)
+        self._pending.append((
+            face,
+            hashlib.sha1(face.tobytes()).hexdigest().encode('ascii'),
+            time.time() if timestamp is None else timestamp,
+            tuple(box) if box is not None else (-1, -1, -1, -1),
+        ))
+        index = len(self) - 1
+        if len(self._pending) >= CHUNK_FACES:
+            self.flush()
+        return index
+    
+    def flush(self):
+        """把缓冲的人脸写入文件"""
+        if not self._pending:
+            return
+        
+        count = len(self._pending)
+        start = self._file['faces'].shape[0]
+        for name in ('faces', 'hashes', 'timestamps', 'boxes'):
+            self._file[name].resize(start + count, axis=0)
+        
+        self._file['faces'][start:] = np.stack([p[0] for p in self._pending])
+        self._file['hashes'][start:] = [p[1] for p in self._pending]
+        self._file['timestamps'][start:] = [p[2] for p in self._pending]
+        self._file['boxes'][start:] = np.array([p[3] for p in self._pending], dtype=np.int32)
+        self._pending = []
+        self._file.flush()
+    
+    def hashes(self):
+        """每张人脸内容的SHA-1"""
+        return [h.decode('ascii') for h in self._file['hashes'][:]]
+    
+    def faces(self):
+        """全部人脸，形状为 N×H×W；连续存储时返回只读内存映射"""
+        dataset = self._file['faces']
+        if self.mode == 'r' and dataset.chunks is None and dataset.compression is None:
+            if self._mmap is None:
+                offset = dataset.id.get_offset()
+                if offset is not None and dataset.shape[0] > 0:
+                    self._mmap = np.memmap(self.path, dtype=dataset.dtype, mode='r',
+                                           offset=offset, shape=dataset.shape)
+            if self._mmap is not None:
+                return self._mmap
+        return dataset[:]
+    
+    def read(self, indices):
+        """按序号读取人脸"""
+        faces = self.faces()
+        return [faces[i] for i in indices]
+    
+    def close(self):
+        """关闭文件；写入模式下先写入缓冲数据并整理为连续存储"""
+        if self._file is None:
+            return
+        
+        if self.mode != 'r':
+            self.flush()
+            self._file.close()
+            self._file = None
+            _compact(self.path)
+        else:
+            self._mmap = None
+            self._file.close()
+            self._file = None
+    
+    def _ensure_writable(self):
+        """创建数据集；若已整理为连续存储，则转换回可追加的分块存储"""
+        width, height = self.face_size
+        if 'faces' not in self._file:
+            self._file.create_dataset('faces', shape=(0, height, width), maxshape=(None, height, width),
+                                      dtype=np.uint8, chunks=(CHUNK_FACES, height, width))
+            self._file.create_dataset('hashes', shape=(0,), maxshape=(None,), dtype='S40', chunks=(1024,))
+            self._file.create_dataset('timestamps', shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(1024,))
+            self._file.create_dataset('boxes', shape=(0, 4), maxshape=(None, 4), dtype=np.int32, chunks=(1024, 4))
+            self._file.attrs['face_size'] = self.face_size
+            return
+        
+        self.face_size = tuple(int(v) for v in self._file.attrs['face_size'])
+        for name in ('faces', 'hashes', 'timestamps', 'boxes'):
+            dataset = self._file[name]
+            if dataset.chunks is not None:
+                continue
+            data = dataset[:]
+            del self._file[name]
+            chunk_rows = CHUNK_FACES if name == 'faces' else 1024
+            self._file.create_dataset(name, data=data, maxshape=(None,) + data.shape[1:],
+                                      chunks=(chunk_rows,) + data.shape[1:])
+
+def _compact(path):
+    """把分块存储整理为连续存储，以便读取时内存映射"""
+    tmp_path = f"{path}.tmp"
+    with h5py.File(path, 'r') as src, h5py.File(tmp_path, 'w') as dst:
+        for name in ('faces', 'hashes', 'timestamps', 'boxes'):
+            data = src[name][:]
+            if data.shape[0] == 0:
+                # 空数据集无法连续存储，保留分块形式
+                dst.create_dataset(name, data=data, maxshape=(None,) + data.shape[1:],
+                                   chunks=src[name].chunks)
+            else:
+                dst.create_dataset(name, data=data)
+        for key, value in src.attrs.items():
+            dst.attrs[key] = value
+    os.replace(tmp_path, path)
+
+def open_packed_store(person_name, mode='r'):
+    """打开某个人员的打包存储"""
+    return PackedFaceStore(packed_store_path(person_name), mode)
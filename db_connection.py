@@ -1,7 +1,15 @@
 import mysql.connector
 from mysql.connector import Error
-from datetime import datetime
+from datetime import datetime, time as datetime_time, timedelta
 import hashlib
+import atexit
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from metrics import metrics
 
 # 数据库配置
 DB_CONFIG = {
@@ -11,14 +19,256 @@ DB_CONFIG = {
     'password': 'your_password'  # 请修改为你的MySQL密码
 }
 
+# 连接池配置
+POOL_CONFIG = {
+    'pool_size': 5,         # 最大连接数
+    'pool_timeout': 10.0,   # 等待空闲连接的最长时间（秒）
+    'ping_interval': 30.0,  # 连接空闲超过该时间，取出前先检测是否存活（秒）
+}
+
+# 识别记录汇总表（按小时/按天、按人员的识别次数、置信度总和及最佳置信度，置信度为距离，越小越好）
+ROLLUP_TABLES = {
+    'hour': 'recognition_rollup_hourly',
+    'day': 'recognition_rollup_daily',
+}
+
+# 汇总表增量更新：与原始记录在同一事务中写入
+ROLLUP_UPSERT = """
+INSERT INTO {table} (bucket, person_name, recognition_count, confidence_sum, best_confidence)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    recognition_count = recognition_count + VALUES(recognition_count),
+    confidence_sum = confidence_sum + VALUES(confidence_sum),
+    best_confidence = LEAST(best_confidence, VALUES(best_confidence))
+"""
+
+class _PoolEntry:
+    """连接池中的一条物理连接及其缓存的预处理语句"""
+    
+    def __init__(self, raw):
+        self.raw = raw
+        self.last_used = time.monotonic()
+        self.statements = {}
+
+class _PreparedCursor:
+    """可复用的预处理游标：close() 只丢弃未读结果，语句保留在连接上"""
+    
+    def __init__(self, cursor):
+        self._cursor = cursor
+    
+    def close(self):
+        try:
+            if self._cursor.with_rows:
+                self._cursor.fetchall()
+        except Error:
+            pass
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class PooledConnection:
+    """从连接池取出的连接
+    
+    用法与普通连接相同；close() 把连接归还连接池而不是断开，
+    is_connected() 只表示连接仍被当前调用方持有，不会再访问服务器。
+    """
+    
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+    
+    def prepared_cursor(self, query):
+        """获取 query 对应的预处理游标，同一连接上重复执行时复用已准备的语句"""
+        cursor = self._entry.statements.get(query)
+        if cursor is None:
+            cursor = _PreparedCursor(self._entry.raw.cursor(prepared=True))
+            self._entry.statements[query] = cursor
+        return cursor
+    
+    def is_connected(self):
+        return self._entry is not None
+    
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+    
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise Error("连接已归还连接池")
+        return getattr(self._entry.raw, name)
+
+class ConnectionPool:
+    """进程内共享的MySQL连接池
+    
+    连接按需创建，最多 pool_size 条；取出空闲超过 ping_interval 的连接前先 ping，
+    失效时重连。归还时回滚未结束的事务，保证下一个使用者看到最新数据。
+    """
+    
+    def __init__(self, config, pool_size=5, pool_timeout=10.0, ping_interval=30.0):
+        self.config = dict(config)
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.ping_interval = ping_interval
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+            'peak_in_use': 0,
+            'reconnects': 0,
+            'discarded': 0,
+        }
+    
+    def get(self, timeout=None):
+        """取出一条连接，超时仍无空闲连接时返回 None"""
+        timeout = self.pool_timeout if timeout is None else timeout
+        start = time.monotonic()
+        
+        with self._cond:
+            while not self._idle and self._created >= self.pool_size:
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    print("数据库连接错误: 等待连接池空闲连接超时")
+                    return None
+                self._cond.wait(remaining)
+            
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                # 先占位，实际连接在锁外建立
+                self._created += 1
+            self._in_use += 1
+            
+            waited = time.monotonic() - start
+            self._stats['checkouts'] += 1
+            self._stats['total_wait'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+            if waited > 0.001:
+                self._stats['waits'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+        
+        try:
+            if entry is None:
+                entry = _PoolEntry(mysql.connector.connect(**self.config))
+            elif time.monotonic() - entry.last_used > self.ping_interval:
+                self._ensure_alive(entry)
+        except Error as e:
+            print(f"数据库连接错误: {e}")
+            with self._cond:
+                self._created -= 1
+                self._in_use -= 1
+                if entry is not None:
+                    self._stats['discarded'] += 1
+                self._cond.notify()
+            # 检测或重连失败的已有连接也要关闭，否则每次失败都会泄漏一个套接字
+            if entry is not None:
+                self._close_entry(entry)
+            return None
+        
+        return PooledConnection(self, entry)
+    
+    def _ensure_alive(self, entry):
+        """检测连接是否存活，失效时重连（预处理语句随之失效）"""
+        try:
+            entry.raw.ping(reconnect=False)
+        except Error:
+            entry.statements.clear()
+            entry.raw.reconnect(attempts=1, delay=0)
+            with self._cond:
+                self._stats['reconnects'] += 1
+    
+    def release(self, entry):
+        """归还连接；回滚失败的连接直接丢弃"""
+        try:
+            if entry.raw.in_transaction:
+                entry.raw.rollback()
+            keep = True
+        except Error:
+            keep = False
+        
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._created -= 1
+                self._stats['discarded'] += 1
+            self._cond.notify()
+        
+        if not keep:
+            self._close_entry(entry)
+    
+    def stats(self):
+        """返回连接池统计：连接数、使用率、等待时间等"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'pool_size': self.pool_size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'utilization': self._in_use / self.pool_size if self.pool_size else 0.0,
+                'avg_wait': stats['total_wait'] / stats['checkouts'] if stats['checkouts'] else 0.0,
+            })
+        return stats
+    
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for entry in idle:
+            self._close_entry(entry)
+    
+    @staticmethod
+    def _close_entry(entry):
+        try:
+            entry.raw.close()
+        except Error:
+            pass
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """获取进程内共享的连接池（子进程中会重新创建）"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+            _pool_pid = os.getpid()
+        return _pool
+
+def configure_pool(**options):
+    """修改连接池配置（pool_size / pool_timeout / ping_interval），已有连接池会被关闭重建"""
+    global _pool
+    unknown = set(options) - set(POOL_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的连接池参数: {', '.join(sorted(unknown))}")
+    
+    with _pool_lock:
+        POOL_CONFIG.update(options)
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+def get_pool_stats():
+    """获取连接池统计信息"""
+    return _get_pool().stats()
+
 def get_connection():
-    """获取数据库连接"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"数据库连接错误: {e}")
-        return None
+    """获取数据库连接（从连接池取出，close() 时归还）"""
+    return _get_pool().get()
+
+atexit.register(lambda: _pool is not None and _pool.close_all())
 
 def init_database():
     """初始化数据库和表"""
@@ -55,6 +305,8 @@ def init_database():
         )
         """
         cursor.execute(create_login_records_table)
+        _ensure_index(cursor, 'login_records', 'idx_login_time', 'login_time, id')
+        _ensure_index(cursor, 'login_records', 'idx_user_login_time', 'user_id, login_time, id')
         
         # 创建识别记录表
         create_recognition_records_table = """
@@ -69,15 +321,55 @@ def init_database():
         """
         cursor.execute(create_recognition_records_table)
         
+        # 识别记录的复合索引（按时间倒序分页、按人员/用户筛选时使用）；已有的表也会补建
+        _ensure_index(cursor, 'recognition_records', 'idx_recognition_time', 'recognition_time, id')
+        _ensure_index(cursor, 'recognition_records', 'idx_person_time', 'person_name, recognition_time, id')
+        _ensure_index(cursor, 'recognition_records', 'idx_user_time', 'user_id, recognition_time, id')
+        
+        # 创建识别记录汇总表（报表只查询汇总表，不扫描原始记录）
+        for granularity, table in ROLLUP_TABLES.items():
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket {'DATETIME' if granularity == 'hour' else 'DATE'} NOT NULL,
+                person_name VARCHAR(100) NOT NULL,
+                recognition_count INT NOT NULL,
+                confidence_sum DOUBLE NOT NULL,
+                best_confidence FLOAT NOT NULL,
+                PRIMARY KEY (bucket, person_name),
+                INDEX idx_person_bucket (person_name, bucket)
+            )
+            """)
+        
+        # 汇总表为空但已有识别记录时（从旧版本升级），需要从原始记录重建
+        cursor.execute(f"SELECT 1 FROM {ROLLUP_TABLES['day']} LIMIT 1")
+        needs_rollup = cursor.fetchone() is None
+        cursor.execute("SELECT 1 FROM recognition_records LIMIT 1")
+        needs_rollup = needs_rollup and cursor.fetchone() is not None
+        
         connection.commit()
         print("数据库初始化成功")
         
     except Error as e:
         print(f"数据库初始化错误: {e}")
+        needs_rollup = False
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
+    
+    if needs_rollup:
+        print("正在从已有识别记录生成汇总表...")
+        rebuild_recognition_rollups()
+
+def _ensure_index(cursor, table, name, columns):
+    """索引不存在时添加（MySQL 不支持 CREATE INDEX IF NOT EXISTS）"""
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, name))
+    if cursor.fetchone() is None:
+        print(f"为 {table} 添加索引 {name}（表较大时需要一些时间）...")
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({columns})")
 
 def hash_password(password):
     """密码哈希"""
@@ -90,10 +382,10 @@ def verify_user(username, password):
         return False
     
     try:
-        cursor = connection.cursor()
         hashed_password = hash_password(password)
         
         query = "SELECT id FROM users WHERE username = %s AND password = %s"
+        cursor = connection.prepared_cursor(query)
         cursor.execute(query, (username, hashed_password))
         
         result = cursor.fetchone()
@@ -114,10 +406,10 @@ def register_user(username, password):
         return False
     
     try:
-        cursor = connection.cursor()
         hashed_password = hash_password(password)
         
         query = "INSERT INTO users (username, password) VALUES (%s, %s)"
+        cursor = connection.prepared_cursor(query)
         cursor.execute(query, (username, hashed_password))
         
         connection.commit()
@@ -142,9 +434,8 @@ def record_login(user_id):
         return False
     
     try:
-        cursor = connection.cursor()
-        
         query = "INSERT INTO login_records (user_id) VALUES (%s)"
+        cursor = connection.prepared_cursor(query)
         cursor.execute(query, (user_id,))
         
         connection.commit()
@@ -165,10 +456,14 @@ def record_recognition(user_id, person_name, confidence):
         return False
     
     try:
-        cursor = connection.cursor()
-        
-        query = "INSERT INTO recognition_records (user_id, person_name, confidence) VALUES (%s, %s, %s)"
-        cursor.execute(query, (user_id, person_name, confidence))
+        row = (user_id, person_name, datetime.now(), float(confidence))
+        query = """
+        INSERT INTO recognition_records (user_id, person_name, recognition_time, confidence)
+        VALUES (%s, %s, %s, %s)
+        """
+        cursor = connection.prepared_cursor(query)
+        cursor.execute(query, row)
+        _update_rollups(connection, [row])
         
         connection.commit()
         return True
@@ -181,6 +476,229 @@ def record_recognition(user_id, person_name, confidence):
             cursor.close()
             connection.close()
 
+class RecognitionWriter:
+    """识别记录异步批量写入器
+    
+    识别循环只把记录放入有界队列，后台线程在攒够 batch_size 条或距上次写入
+    超过 flush_interval 秒时用 executemany 一次性写入。队列满时丢弃新记录并计数，
+    保证采集循环不会因数据库往返而阻塞。
+    """
+    
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+        self._thread = threading.Thread(target=self._run, name="RecognitionWriter", daemon=True)
+        self._thread.start()
+        metrics.register_gauge('db_queue_depth', self._queue.qsize)
+        metrics.register_gauge('db_dropped_records', lambda: self._dropped)
+    
+    def submit(self, user_id, person_name, confidence):
+        """提交一条识别记录（不阻塞），队列已满时返回 False"""
+        # 入队时记录时间，避免批量写入导致识别时间不准确
+        row = (user_id, person_name, datetime.now(), float(confidence))
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+    
+    def stats(self):
+        """返回写入器状态：队列深度、已写入、丢弃、失败条数及批次数"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'batches': self._batches,
+            }
+    
+    def close(self, timeout=5.0):
+        """停止后台线程，并把队列中剩余的记录全部写入"""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+    
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        
+        while True:
+            stopping = self._stop_event.is_set()
+            try:
+                if stopping:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    # 最多等待 0.1 秒，以便及时响应停止信号
+                    timeout = min(max(0.0, deadline - time.monotonic()), 0.1)
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline or (stopping and self._queue.empty()):
+                if batch:
+                    with metrics.stage('db_flush'):
+                        self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+                
+                if stopping and self._queue.empty():
+                    break
+    
+    def _flush(self, batch):
+        connection = get_connection()
+        if not connection:
+            with self._lock:
+                self._failed += len(batch)
+            return
+        
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            
+            query = """
+            INSERT INTO recognition_records (user_id, person_name, recognition_time, confidence)
+            VALUES (%s, %s, %s, %s)
+            """
+            cursor.executemany(query, batch)
+            _update_rollups(connection, batch)
+            
+            connection.commit()
+            with self._lock:
+                self._written += len(batch)
+                self._batches += 1
+            
+        except Error as e:
+            print(f"批量写入识别记录错误: {e}")
+            with self._lock:
+                self._failed += len(batch)
+        finally:
+            if connection.is_connected():
+                if cursor is not None:
+                    cursor.close()
+                connection.close()
+
+def _rollup_rows(rows):
+    """把识别记录 (user_id, person_name, time, confidence) 按小时/按天及人员聚合为汇总表的增量行"""
+    buckets = {granularity: {} for granularity in ROLLUP_TABLES}
+    for _, person_name, recognized_at, confidence in rows:
+        keys = {
+            'hour': recognized_at.replace(minute=0, second=0, microsecond=0),
+            'day': recognized_at.date(),
+        }
+        for granularity, bucket in keys.items():
+            entry = buckets[granularity].get((bucket, person_name or ''))
+            if entry is None:
+                buckets[granularity][(bucket, person_name or '')] = [1, confidence, confidence]
+            else:
+                entry[0] += 1
+                entry[1] += confidence
+                entry[2] = min(entry[2], confidence)
+    
+    # 按主键顺序更新，多个写入进程同时更新时不会互相死锁
+    return {granularity: [key + tuple(values) for key, values in sorted(entries.items())]
+            for granularity, entries in buckets.items()}
+
+def _update_rollups(connection, rows):
+    """在当前事务中把一批识别记录累加到汇总表"""
+    for granularity, rollup_rows in _rollup_rows(rows).items():
+        query = ROLLUP_UPSERT.format(table=ROLLUP_TABLES[granularity])
+        connection.prepared_cursor(query).executemany(query, rollup_rows)
+
+def _bucket_range(start, end):
+    """把时间范围扩展到整天，返回 (start, end)；为 None 的一端不限制"""
+    if start is not None:
+        start = datetime.combine(start.date() if isinstance(start, datetime) else start, datetime_time())
+    if end is not None:
+        end_day = end.date() if isinstance(end, datetime) else end
+        if not isinstance(end, datetime) or end != datetime.combine(end_day, datetime_time()):
+            end_day += timedelta(days=1)
+        end = datetime.combine(end_day, datetime_time())
+    return start, end
+
+def _range_conditions(column, start, end):
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append(f"{column} >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} < %s")
+        params.append(end)
+    return conditions, params
+
+def rebuild_recognition_rollups(start=None, end=None):
+    """从原始识别记录重建汇总表（升级后回填，或删除原始记录后修正）
+    
+    start / end 为时间范围（扩展到整天），都为 None 时重建全部。
+    重建在一个事务中完成，期间该范围内的新记录写入会等待。
+    """
+    start, end = _bucket_range(start, end)
+    connection = get_connection()
+    if not connection:
+        return False
+    
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        conditions, params = _range_conditions('recognition_time', start, end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        buckets = {
+            'hour': "TIMESTAMP(DATE(recognition_time), MAKETIME(HOUR(recognition_time), 0, 0))",
+            'day': "DATE(recognition_time)",
+        }
+        for granularity, table in ROLLUP_TABLES.items():
+            bucket_conditions, bucket_params = _range_conditions('bucket', start, end)
+            cursor.execute(f"DELETE FROM {table}" +
+                           (f" WHERE {' AND '.join(bucket_conditions)}" if bucket_conditions else ""),
+                           tuple(bucket_params))
+            cursor.execute(f"""
+            INSERT INTO {table} (bucket, person_name, recognition_count, confidence_sum, best_confidence)
+            SELECT {buckets[granularity]}, COALESCE(person_name, ''), COUNT(*), SUM(confidence), MIN(confidence)
+            FROM recognition_records
+            {where}
+            GROUP BY 1, 2
+            """, tuple(params))
+        
+        connection.commit()
+        return True
+        
+    except Error as e:
+        print(f"重建识别汇总表错误: {e}")
+        return False
+    finally:
+        if connection.is_connected():
+            if cursor is not None:
+                cursor.close()
+            connection.close()
+
+_recognition_writer = None
+_recognition_writer_lock = threading.Lock()
+
+def get_recognition_writer():
+    """获取进程内共享的识别记录写入器（首次调用时启动）"""
+    global _recognition_writer
+    with _recognition_writer_lock:
+        if _recognition_writer is None:
+            _recognition_writer = RecognitionWriter()
+            atexit.register(_recognition_writer.close)
+        return _recognition_writer
+
+def record_recognition_async(user_id, person_name, confidence):
+    """异步记录人脸识别结果（由后台线程批量写入）"""
+    return get_recognition_writer().submit(user_id, person_name, confidence)
+
 def get_user_id(username):
     """获取用户ID"""
     connection = get_connection()
@@ -188,9 +706,8 @@ def get_user_id(username):
         return None
     
     try:
-        cursor = connection.cursor()
-        
         query = "SELECT id FROM users WHERE username = %s"
+        cursor = connection.prepared_cursor(query)
         cursor.execute(query, (username,))
         
         result = cursor.fetchone()
@@ -204,86 +721,244 @@ def get_user_id(username):
             cursor.close()
             connection.close()
 
-def get_recognition_records(user_id=None, limit=100):
-    """获取识别记录"""
+# 历史记录查询：选择的列、来源表及分页使用的时间列
+HISTORY_QUERIES = {
+    'recognition': {
+        'columns': ['id', 'username', 'person_name', 'recognition_time', 'confidence'],
+        'select': "r.id, u.username, r.person_name, r.recognition_time, r.confidence",
+        'from': "recognition_records r JOIN users u ON r.user_id = u.id",
+        'alias': 'r',
+        'time': 'recognition_time',
+    },
+    'login': {
+        'columns': ['id', 'username', 'login_time'],
+        'select': "l.id, u.username, l.login_time",
+        'from': "login_records l JOIN users u ON l.user_id = u.id",
+        'alias': 'l',
+        'time': 'login_time',
+    },
+}
+
+# 流式导出时每次从服务器读取的行数
+EXPORT_BATCH_SIZE = 5000
+
+def _history_query(kind, user_id=None, person_name=None, start=None, end=None, before=None,
+                   limit=None, descending=True):
+    """构造历史记录查询，按 (时间, id) 排序，返回 (query, params)
+    
+    before 为上一页最后一行的 (时间, id)，只返回排在它之后的记录（键集分页），
+    查询沿 (时间, id) 复合索引定位，不需要 OFFSET 跳过前面的行。
+    """
+    spec = HISTORY_QUERIES[kind]
+    alias = spec['alias']
+    time_column = f"{alias}.{spec['time']}"
+    
+    conditions, params = _range_conditions(time_column, start, end)
+    if user_id:
+        conditions.append(f"{alias}.user_id = %s")
+        params.append(user_id)
+    if person_name is not None:
+        conditions.append(f"{alias}.person_name = %s")
+        params.append(person_name)
+    if before is not None:
+        conditions.append(f"({time_column}, {alias}.id) {'<' if descending else '>'} (%s, %s)")
+        params.extend(before)
+    
+    order = "DESC" if descending else "ASC"
+    query = f"SELECT {spec['select']} FROM {spec['from']}"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    query += f" ORDER BY {time_column} {order}, {alias}.id {order}"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, tuple(params)
+
+def _fetch_history(kind, error_message, **options):
     connection = get_connection()
     if not connection:
         return []
     
+    cursor = None
     try:
+        query, params = _history_query(kind, **options)
         cursor = connection.cursor()
-        
-        if user_id:
-            query = """
-            SELECT r.id, u.username, r.person_name, r.recognition_time, r.confidence
-            FROM recognition_records r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.user_id = %s
-            ORDER BY r.recognition_time DESC
-            LIMIT %s
-            """
-            cursor.execute(query, (user_id, limit))
-        else:
-            query = """
-            SELECT r.id, u.username, r.person_name, r.recognition_time, r.confidence
-            FROM recognition_records r
-            JOIN users u ON r.user_id = u.id
-            ORDER BY r.recognition_time DESC
-            LIMIT %s
-            """
-            cursor.execute(query, (limit,))
-        
-        records = cursor.fetchall()
-        return records
+        cursor.execute(query, params)
+        return cursor.fetchall()
         
     except Error as e:
-        print(f"获取识别记录错误: {e}")
+        print(f"{error_message}: {e}")
         return []
     finally:
         if connection.is_connected():
-            cursor.close()
+            if cursor is not None:
+                cursor.close()
             connection.close()
 
-def get_login_records(user_id=None, limit=100):
-    """获取登录记录"""
+def page_cursor(records, kind='recognition'):
+    """一页记录的翻页游标（最后一行的 (时间, id)），作为下一页的 before 参数；没有记录时返回 None"""
+    if not records:
+        return None
+    last = records[-1]
+    return last[HISTORY_QUERIES[kind]['columns'].index(HISTORY_QUERIES[kind]['time'])], last[0]
+
+def get_recognition_records(user_id=None, limit=100, before=None, start=None, end=None, person_name=None):
+    """获取识别记录（从新到旧），返回 [(id, 用户名, 人员, 识别时间, 置信度), ...]
+    
+    翻页时把 page_cursor(上一页) 作为 before 传入；start / end 限定识别时间（含 start，不含 end），
+    person_name 只返回该人员的记录。
+    """
+    return _fetch_history('recognition', "获取识别记录错误", user_id=user_id, person_name=person_name,
+                          start=start, end=end, before=before, limit=limit)
+
+def _rollup_query(granularity, select, start, end, person_name, group_by=""):
+    if granularity not in ROLLUP_TABLES:
+        raise ValueError(f"未知的汇总粒度: {granularity}")
+    
+    conditions, params = _range_conditions('bucket', start, end)
+    if person_name is not None:
+        conditions.append("person_name = %s")
+        params.append(person_name)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {select} FROM {ROLLUP_TABLES[granularity]} {where} {group_by}", tuple(params)
+
+def _fetch_rollups(query, params, error_message):
     connection = get_connection()
     if not connection:
         return []
     
+    cursor = None
     try:
         cursor = connection.cursor()
-        
-        if user_id:
-            query = """
-            SELECT l.id, u.username, l.login_time
-            FROM login_records l
-            JOIN users u ON l.user_id = u.id
-            WHERE l.user_id = %s
-            ORDER BY l.login_time DESC
-            LIMIT %s
-            """
-            cursor.execute(query, (user_id, limit))
-        else:
-            query = """
-            SELECT l.id, u.username, l.login_time
-            FROM login_records l
-            JOIN users u ON l.user_id = u.id
-            ORDER BY l.login_time DESC
-            LIMIT %s
-            """
-            cursor.execute(query, (limit,))
-        
-        records = cursor.fetchall()
-        return records
+        cursor.execute(query, params)
+        return cursor.fetchall()
         
     except Error as e:
-        print(f"获取登录记录错误: {e}")
+        print(f"{error_message}: {e}")
         return []
     finally:
         if connection.is_connected():
-            cursor.close()
+            if cursor is not None:
+                cursor.close()
             connection.close()
 
+def get_recognition_rollups(granularity='day', start=None, end=None, person_name=None):
+    """按小时（'hour'）或按天（'day'）的识别统计，只查询汇总表
+    
+    返回 [(时间段, 人员, 识别次数, 平均置信度, 最佳置信度), ...]，按时间段和人员排序；
+    start / end 为时间段起止（含 start，不含 end），person_name 为空时返回所有人员。
+    """
+    query, params = _rollup_query(
+        granularity,
+        "bucket, person_name, recognition_count, confidence_sum / recognition_count, best_confidence",
+        start, end, person_name, "ORDER BY bucket, person_name")
+    return _fetch_rollups(query, params, "获取识别统计错误")
+
+def get_recognition_totals(start=None, end=None, person_name=None, granularity='day'):
+    """时间范围内每个人员的识别总数、平均置信度和最佳置信度，只查询汇总表
+    
+    返回 [(人员, 识别次数, 平均置信度, 最佳置信度), ...]，按识别次数降序；
+    按天汇总时 start / end 以天为单位，需要按小时截取时传 granularity='hour'。
+    """
+    query, params = _rollup_query(
+        granularity,
+        "person_name, SUM(recognition_count), SUM(confidence_sum) / SUM(recognition_count), MIN(best_confidence)",
+        start, end, person_name, "GROUP BY person_name ORDER BY 2 DESC")
+    return _fetch_rollups(query, params, "获取识别统计错误")
+
+def get_login_records(user_id=None, limit=100, before=None, start=None, end=None):
+    """获取登录记录（从新到旧），返回 [(id, 用户名, 登录时间), ...]
+    
+    翻页时把 page_cursor(上一页, 'login') 作为 before 传入；start / end 限定登录时间。
+    """
+    return _fetch_history('login', "获取登录记录错误", user_id=user_id,
+                          start=start, end=end, before=before, limit=limit)
+
+def _export_connection():
+    """导出专用的独立连接（不经过连接池）
+    
+    使用纯 Python 实现：结果集未读完时 close() 直接断开，不会先把剩余的行读进内存
+    （连接池归还时的 rollback() 和 C 扩展的 close() 都会先读完未读结果）。
+    """
+    try:
+        return mysql.connector.connect(**DB_CONFIG, use_pure=True)
+    except Error as e:
+        print(f"数据库连接错误: {e}")
+        return None
+
+def _export_history(kind, path, output_format, batch_size, **options):
+    """按时间从旧到新把历史记录流式写入 CSV 或 JSONL，返回导出行数，失败时返回 None
+    
+    使用独立连接上的非缓冲游标，结果集由服务器逐批发送，fetchmany 每次只取 batch_size 行，
+    内存占用与记录总数无关。先写入临时文件，完成后再替换目标文件。
+    """
+    output_format = output_format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    if output_format not in ('csv', 'jsonl'):
+        raise ValueError(f"不支持的导出格式: {output_format}")
+    
+    connection = _export_connection()
+    if not connection:
+        return None
+    
+    columns = HISTORY_QUERIES[kind]['columns']
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    cursor = None
+    count = 0
+    complete = False
+    try:
+        query, params = _history_query(kind, descending=False, **options)
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(query, params)
+        
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f) if output_format == 'csv' else None
+            if writer is not None:
+                writer.writerow(columns)
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if writer is not None:
+                    writer.writerows(rows)
+                else:
+                    f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + '\n'
+                                 for row in rows)
+                count += len(rows)
+        
+        os.replace(tmp_path, path)
+        complete = True
+        return count
+        
+    except (Error, OSError) as e:
+        print(f"导出记录错误（已写入 {count} 行）: {e}")
+        return None
+    finally:
+        # 任何异常（包括上面未捕获的）中断导出时都删除临时文件并关闭游标和连接；
+        # 纯 Python 连接在结果集未读完时 close() 只报错不读取剩余行，报错后直接断开套接字
+        if not complete and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Error:
+                pass
+        try:
+            connection.close()
+        except Error:
+            pass
+
+def export_recognition_records(path, output_format=None, start=None, end=None, person_name=None, user_id=None,
+                               batch_size=EXPORT_BATCH_SIZE):
+    """把识别记录流式导出为 CSV 或 JSONL（默认按扩展名），返回导出行数，失败时返回 None"""
+    return _export_history('recognition', path, output_format, batch_size, user_id=user_id,
+                           person_name=person_name, start=start, end=end)
+
+def export_login_records(path, output_format=None, start=None, end=None, user_id=None,
+                         batch_size=EXPORT_BATCH_SIZE):
+    """把登录记录流式导出为 CSV 或 JSONL（默认按扩展名），返回导出行数，失败时返回 None"""
+    return _export_history('login', path, output_format, batch_size, user_id=user_id, start=start, end=end)
+
 if __name__ == "__main__":
     # 测试数据库连接和初始化
     print("初始化数据库...")
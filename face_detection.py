@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+
+# Haar 人脸检测器模型文件
+CASCADE_PATH = 'data/haarcascade_frontalface_default.xml'
+
+# Haar 人脸检测器的训练窗口大小，缩小后的人脸小于该尺寸将无法检测
+CASCADE_WINDOW = 24
+
+def detect_faces_scaled(cascade, gray, detect_scale=1.0, min_size=(30, 30), max_size=None,
+                        scale_factor=1.1, min_neighbors=5):
+    """在缩小后的灰度图上检测人脸，返回原图坐标下的 (x, y, w, h) 数组
+    
+    detect_scale 为检测图相对原图的缩放比例（如 0.5 表示在 1/2 分辨率上检测）；
+    min_size / max_size 均以原图像素为单位，内部按比例换算。
+    缩放后最小可检测人脸约为 CASCADE_WINDOW / detect_scale 个原图像素。
+    """
+    if detect_scale >= 1.0:
+        small = gray
+        detect_scale = 1.0
+    else:
+        small = cv2.resize(gray, None, fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA)
+    
+    scaled_min = tuple(max(1, int(round(v * detect_scale))) for v in min_size)
+    scaled_max = tuple(int(round(v * detect_scale)) for v in max_size) if max_size else (0, 0)
+    
+    faces = cascade.detectMultiScale(
+        small,
+        scaleFactor=scale_factor,
+        minNeighbors=min_neighbors,
+        minSize=scaled_min,
+        maxSize=scaled_max
+    )
+    
+    if len(faces) == 0 or detect_scale == 1.0:
+        return faces
+    
+    # 映射回原图坐标，并限制在图像范围内
+    height, width = gray.shape[:2]
+    boxes = np.round(np.asarray(faces, dtype=np.float64) / detect_scale).astype(int)
+    boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+    boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return boxes
+
+def min_detectable_size(detect_scale):
+    """给定检测缩放比例时，原图中可检测的最小人脸边长（像素）"""
+    return int(np.ceil(CASCADE_WINDOW / min(1.0, detect_scale)))
@@ -1,5 +1,7 @@
 import sys
 import os
+import threading
+import time
 import cv2
 import numpy as np
 from PyQt5.QtWidgets import *
@@ -12,31 +14,293 @@ from Detector import *
 from create_classifier import *
 from create_dataset import *
 from db_connection import *
+from frame_source import open_source
+from face_tracker import FaceTracker
+from metrics import metrics
+
+# 登录界面背景视频
+BACKGROUND_VIDEO = 'videos/bg.mp4'
+
+# 背景视频缓存上限（字节）：缩放后的整段视频不超过该大小时只解码一次，之后循环播放缓存
+BACKGROUND_CACHE_LIMIT = 256 * 1024 * 1024
 
 class VideoThread(QThread):
-    change_pixmap_signal = pyqtSignal(np.ndarray)
+    change_pixmap_signal = pyqtSignal(QImage)
 
-    def __init__(self):
+    def __init__(self, video_path=BACKGROUND_VIDEO, size=(800, 600), cache_limit=BACKGROUND_CACHE_LIMIT):
         super().__init__()
+        self.video_path = video_path
+        self.size = size
+        self.cache_limit = cache_limit
         self._run_flag = True
+        self._resume = threading.Event()
+        self._resume.set()
 
     def run(self):
         # 打开视频文件
-        cap = cv2.VideoCapture('videos/bg.mp4')
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            print(f"错误：无法打开背景视频 {self.video_path}")
+            return
+        
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        interval = 1.0 / fps if 0 < fps < 240 else 1.0 / 25
+        
+        cache = []
+        cache_bytes = 0
+        caching = True
+        deadline = time.monotonic()
         while self._run_flag:
             ret, cv_img = cap.read()
-            if ret:
-                self.change_pixmap_signal.emit(cv_img)
-            else:
+            if not ret:
+                if caching and cache:
+                    # 整段视频已缓存，不再解码
+                    break
+                if caching:
+                    print(f"错误：无法读取背景视频 {self.video_path}")
+                    break
                 # 视频播放完毕，重新开始
                 cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                caching = False
+                continue
+            
+            image = self._convert(cv_img)
+            if caching:
+                cache_bytes += image.sizeInBytes()
+                if cache_bytes > self.cache_limit:
+                    cache, caching = [], False
+                else:
+                    cache.append(image)
+            deadline = self._emit(image, deadline, interval)
         cap.release()
+        
+        while self._run_flag and cache:
+            for image in cache:
+                if not self._run_flag:
+                    break
+                deadline = self._emit(image, deadline, interval)
+
+    def _convert(self, cv_img):
+        """在后台线程中缩放（按比例铺满后居中裁剪）并转换为 QImage"""
+        width, height = self.size
+        h, w = cv_img.shape[:2]
+        scale = max(width / w, height / h)
+        resized = cv2.resize(cv_img, (max(width, round(w * scale)), max(height, round(h * scale))),
+                             interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        top = (resized.shape[0] - height) // 2
+        left = (resized.shape[1] - width) // 2
+        rgb_image = np.ascontiguousarray(cv2.cvtColor(resized[top:top+height, left:left+width], cv2.COLOR_BGR2RGB))
+        # copy() 让 QImage 持有自己的数据，不依赖 numpy 数组的生命周期
+        return QImage(rgb_image.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+
+    def _emit(self, image, deadline, interval):
+        """按视频帧率发送一帧，暂停期间等待恢复，返回下一帧的发送时间"""
+        if not self._resume.is_set():
+            self._resume.wait()
+            deadline = time.monotonic()
+        
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -interval:
+            # 落后超过一帧（如系统繁忙）时重新计时，不连续补发
+            deadline = time.monotonic()
+        
+        if self._run_flag:
+            self.change_pixmap_signal.emit(image)
+        return deadline + interval
+
+    def pause(self):
+        """暂停播放（窗口隐藏或最小化时）"""
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
 
     def stop(self):
         """Sets run flag to False and waits for thread to finish"""
         self._run_flag = False
+        self._resume.set()
         self.wait()
 
+# 实时画面显示区域大小
+LIVE_VIEW_SIZE = (800, 600)
+
+class FrameWorker(QThread):
+    """在后台线程中采集和处理视频帧，只向界面提供最新的一帧
+    
+    工作线程把处理好的帧缩放、转换为 QImage 后覆盖保存为“最新帧”，
+    界面还没取走上一帧时不再发送信号，来不及显示的旧帧直接被丢弃，
+    界面事件队列中最多只有一个待处理的帧通知。
+    """
+    frame_ready = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, view_size=LIVE_VIEW_SIZE):
+        super().__init__()
+        self.view_size = view_size
+        self._run_flag = True
+        self._lock = threading.Lock()
+        self._latest = None
+        self._pending = False
+        self._last_time = None
+        self.fps = 0.0
+
+    def publish(self, frame, captured):
+        """提交一帧处理结果，captured 为该帧采集完成的时间（time.perf_counter）"""
+        now = time.perf_counter()
+        if self._last_time is not None and now > self._last_time:
+            # 指数平滑的处理帧率
+            rate = 1.0 / (now - self._last_time)
+            self.fps = rate if self.fps == 0.0 else 0.9 * self.fps + 0.1 * rate
+        self._last_time = now
+        
+        # 在工作线程中按比例缩放并转换格式，界面线程只负责显示
+        width, height = self.view_size
+        h, w = frame.shape[:2]
+        scale = min(width / w, height / h)
+        if scale != 1:
+            frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        rgb_image = np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        h, w = rgb_image.shape[:2]
+        image = QImage(rgb_image.data, w, h, 3 * w, QImage.Format_RGB888).copy()
+        
+        with self._lock:
+            self._latest = (image, captured, self.fps)
+            notify = not self._pending
+            self._pending = True
+        if notify:
+            self.frame_ready.emit()
+
+    def take_frame(self):
+        """取走最新一帧，返回 (QImage, 采集时间, 帧率)；没有新帧时返回 None"""
+        with self._lock:
+            latest, self._latest = self._latest, None
+            self._pending = False
+        return latest
+
+    def stop(self):
+        """通知工作线程退出并等待结束"""
+        self._run_flag = False
+        self.wait()
+
+class RecognitionWorker(FrameWorker):
+    """实时人脸识别工作线程（替代 Detector.recognize_face 中的 imshow 窗口）"""
+
+    def __init__(self, person_name=None, source=0, track=False, detector=None, view_size=LIVE_VIEW_SIZE):
+        super().__init__(view_size)
+        self.person_name = person_name
+        self.source = source
+        self.track = track
+        self.detector = detector
+
+    def run(self):
+        if self.detector is None:
+            try:
+                self.detector = Detector()
+            except FileNotFoundError as e:
+                self.failed.emit(str(e))
+                return
+        
+        recognizer, label_names = self.detector.load_recognizer(self.person_name)
+        if recognizer is None:
+            self.failed.emit("无法加载识别模型！")
+            return
+        
+        cap = open_source(self.source)
+        if not cap.isOpened():
+            self.failed.emit(f"无法打开视频源 {self.source}")
+            return
+        
+        tracker = FaceTracker() if self.track else None
+        while self._run_flag:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            captured = time.perf_counter()
+            
+            results = self.detector.recognize_frame(frame, recognizer, label_names, self.person_name, tracker)
+            self.detector.annotate_frame(frame, results)
+            metrics.mark_frame()
+            self.publish(frame, captured)
+        
+        cap.release()
+        self.detector.print_output_stats()
+        self.detector.close()
+
+class DatasetWorker(FrameWorker):
+    """人脸数据采集工作线程"""
+
+    def __init__(self, person_name, source=0, view_size=LIVE_VIEW_SIZE):
+        super().__init__(view_size)
+        self.person_name = person_name
+        self.source = source
+
+    def run(self):
+        if not create_dataset(self.person_name, self.source, display=False, on_frame=self._on_frame):
+            self.failed.emit(f"无法开始采集：请检查人脸检测器文件和视频源 {self.source}")
+
+    def _on_frame(self, frame):
+        self.publish(frame, time.perf_counter())
+        return self._run_flag
+
+class LiveViewWindow(QDialog):
+    """嵌入式实时画面窗口：显示工作线程的最新帧及帧率、延迟"""
+
+    def __init__(self, title, worker, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setWindowIcon(QIcon('icon.ico'))
+        self.worker = worker
+        
+        self.video_label = QLabel("正在打开摄像头...")
+        self.video_label.setAlignment(Qt.AlignCenter)
+        self.video_label.setFixedSize(*worker.view_size)
+        self.video_label.setStyleSheet("background: black; color: white; font-size: 16px;")
+        
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("font-size: 14px; color: #2c3e50;")
+        
+        stop_button = QPushButton("结束")
+        stop_button.setFixedWidth(120)
+        stop_button.clicked.connect(self.close)
+        
+        bottom_layout = QHBoxLayout()
+        bottom_layout.addWidget(self.status_label)
+        bottom_layout.addStretch()
+        bottom_layout.addWidget(stop_button)
+        
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.video_label)
+        layout.addLayout(bottom_layout)
+        
+        worker.frame_ready.connect(self.show_frame)
+        worker.failed.connect(self.show_error)
+        worker.finished.connect(self.worker_finished)
+        worker.start()
+        
+    def show_frame(self):
+        latest = self.worker.take_frame()
+        if latest is None:
+            return
+        image, captured, fps = latest
+        self.video_label.setPixmap(QPixmap.fromImage(image))
+        
+        # 延迟为帧采集完成到显示在界面上的时间
+        latency = (time.perf_counter() - captured) * 1000
+        self.status_label.setText(f"帧率: {fps:.1f} fps    延迟: {latency:.0f} ms")
+        
+    def show_error(self, message):
+        QMessageBox.warning(self, "错误", message)
+        
+    def worker_finished(self):
+        self.status_label.setText(self.status_label.text() + "    已结束")
+        
+    def closeEvent(self, event):
+        self.worker.stop()
+        event.accept()
+
 class LoginWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -195,14 +459,18 @@ class LoginWindow(QMainWindow):
         main_layout.addWidget(overlay_widget)
         main_layout.setContentsMargins(0, 0, 0, 0)
         
-    def update_background(self, cv_img):
-        """更新背景视频"""
-        rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        convert_to_Qt_format = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        p = convert_to_Qt_format.scaled(800, 600, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
-        self.background_label.setPixmap(QPixmap.fromImage(p))
+    def update_background(self, image):
+        """更新背景视频（帧已在视频线程中缩放为窗口大小）"""
+        self.background_label.setPixmap(QPixmap.fromImage(image))
+        
+    def showEvent(self, event):
+        self.thread.resume()
+        super().showEvent(event)
+        
+    def hideEvent(self, event):
+        # 窗口隐藏或最小化时暂停背景视频
+        self.thread.pause()
+        super().hideEvent(event)
         
     def login(self):
         username = self.username_input.text().strip()
@@ -373,6 +641,7 @@ class MainWindow(QMainWindow):
             }
         """)
         
+        self.live_window = None
         self.init_ui()
         
     def init_ui(self):
@@ -495,11 +764,30 @@ class MainWindow(QMainWindow):
         }
         return color_map.get(color, color)
         
+    def live_view_running(self):
+        """已有采集或识别窗口在运行时将其置前并返回 True（摄像头同一时间只供一个任务使用）"""
+        if self.live_window is not None and self.live_window.isVisible():
+            self.live_window.raise_()
+            self.live_window.activateWindow()
+            return True
+        return False
+        
+    def open_live_view(self, title, worker):
+        self.live_window = LiveViewWindow(title, worker, self)
+        self.live_window.show()
+        
+    def closeEvent(self, event):
+        if self.live_window is not None:
+            self.live_window.close()
+        event.accept()
+        
     def collect_data(self):
+        if self.live_view_running():
+            return
         name, ok = QInputDialog.getText(self, '输入姓名', '请输入要采集人脸数据的人员姓名:')
         if ok and name:
-            QMessageBox.information(self, "提示", f"开始采集 {name} 的人脸数据\n请面对摄像头，按 'q' 键结束采集")
-            create_dataset(name)
+            # 采集在工作线程中进行，画面显示在窗口内，主界面不会被阻塞
+            self.open_live_view(f"采集 {name} 的人脸数据", DatasetWorker(name))
             
     def train_model(self):
         # 获取可用的人员列表
@@ -508,20 +796,26 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", "数据目录不存在！")
             return
             
-        persons = [d for d in os.listdir(data_dir) 
-                  if os.path.isdir(os.path.join(data_dir, d)) and d != "classifiers"]
+        persons = list_persons(data_dir)
         
         if not persons:
             QMessageBox.warning(self, "错误", "没有找到人脸数据！请先采集数据。")
             return
             
-        person, ok = QInputDialog.getItem(self, '选择人员', '请选择要训练的人员:', persons, 0, False)
-        if ok and person:
+        gallery_item = "全部人员（综合模型）"
+        person, ok = QInputDialog.getItem(self, '选择人员', '请选择要训练的人员:', [gallery_item] + persons, 0, False)
+        if ok and person == gallery_item:
+            QMessageBox.information(self, "提示", "开始训练综合识别模型...")
+            create_gallery_classifier()
+            QMessageBox.information(self, "完成", "综合识别模型训练完成！")
+        elif ok and person:
             QMessageBox.information(self, "提示", f"开始训练 {person} 的识别模型...")
             create_classifier(person)
             QMessageBox.information(self, "完成", f"{person} 的识别模型训练完成！")
             
     def start_recognition(self):
+        if self.live_view_running():
+            return
         # 获取可用的分类器列表
         classifier_dir = "data/classifiers"
         if not os.path.exists(classifier_dir):
@@ -529,7 +823,11 @@ class MainWindow(QMainWindow):
             return
             
         classifiers = [f[:-4] for f in os.listdir(classifier_dir) 
-                      if f.endswith('.xml')]
+                      if f.endswith('.xml') and f != os.path.basename(GALLERY_MODEL_PATH)]
+        
+        gallery_item = "全部人员（综合模型）"
+        if os.path.exists(GALLERY_MODEL_PATH):
+            classifiers.insert(0, gallery_item)
         
         if not classifiers:
             QMessageBox.warning(self, "错误", "没有找到训练好的模型！请先训练模型。")
@@ -537,9 +835,7 @@ class MainWindow(QMainWindow):
             
         person, ok = QInputDialog.getItem(self, '选择模型', '请选择要使用的识别模型:', classifiers, 0, False)
         if ok and person:
-            QMessageBox.information(self, "提示", f"启动 {person} 的人脸识别\n按 'q' 键退出识别")
-            detector = Detector()
-            detector.recognize_face(person)
+            self.open_live_view(f"{person} 的人脸识别", RecognitionWorker(None if person == gallery_item else person))
             
     def view_records(self):
         QMessageBox.information(self, "功能开发中", "识别记录查看功能正在开发中...")
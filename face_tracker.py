@@ -0,0 +1,154 @@
+import cv2
+import numpy as np
+
+def box_iou(a, b):
+    """计算两个 (x, y, w, h) 矩形框的交并比"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+class Track:
+    """一条人脸轨迹：当前位置、模板以及缓存的识别结果"""
+    
+    def __init__(self, track_id, box, template):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.template = template
+        self.identity = None   # (name, confidence)，首次识别后缓存
+        self.refreshed = True  # 本帧是否由检测结果更新
+        self.misses = 0
+
+class FaceTracker:
+    """先检测后跟踪
+    
+    每隔 detect_interval 帧（或有轨迹丢失时）做一次完整的人脸检测，
+    中间帧在上一位置附近用模板匹配跟踪人脸。每条轨迹的识别结果会被缓存，
+    识别只在轨迹建立时执行一次，而不是每帧执行。
+    """
+    
+    def __init__(self, detect_interval=10, iou_threshold=0.3, match_threshold=0.6,
+                 search_margin=0.5, template_width=32, max_misses=1):
+        self.detect_interval = max(1, detect_interval)
+        self.iou_threshold = iou_threshold
+        self.match_threshold = match_threshold
+        self.search_margin = search_margin
+        self.template_width = template_width
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = 1
+        self._frames_since_detection = None
+        self._lost = False
+    
+    def needs_detection(self):
+        """当前帧是否需要完整检测"""
+        return (self._frames_since_detection is None or self._lost
+                or self._frames_since_detection + 1 >= self.detect_interval)
+    
+    def update(self, gray, boxes):
+        """用检测结果更新轨迹：匹配已有轨迹，未匹配的检测框建立新轨迹"""
+        self._frames_since_detection = 0
+        self._lost = False
+        
+        for track in self.tracks:
+            track.refreshed = False
+        
+        # 按交并比从大到小贪心匹配
+        pairs = sorted(((box_iou(track.box, box), i, j)
+                        for i, track in enumerate(self.tracks)
+                        for j, box in enumerate(boxes)), reverse=True)
+        matched_tracks = set()
+        matched_boxes = set()
+        for iou, i, j in pairs:
+            if iou < self.iou_threshold:
+                break
+            if i in matched_tracks or j in matched_boxes:
+                continue
+            matched_tracks.add(i)
+            matched_boxes.add(j)
+            track = self.tracks[i]
+            track.box = tuple(int(v) for v in boxes[j])
+            track.template = self._make_template(gray, track.box)
+            track.refreshed = True
+            track.misses = 0
+        
+        survivors = []
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        self.tracks = survivors
+        
+        for j, box in enumerate(boxes):
+            if j not in matched_boxes:
+                track = Track(self._next_id, box, self._make_template(gray, box))
+                self._next_id += 1
+                self.tracks.append(track)
+        
+        return self.tracks
+    
+    def track(self, gray):
+        """在两次检测之间跟踪已有轨迹，匹配度过低的轨迹视为丢失"""
+        self._frames_since_detection += 1
+        survivors = []
+        
+        for track in self.tracks:
+            track.refreshed = False
+            box = self._match(gray, track)
+            if box is None:
+                self._lost = True
+                continue
+            track.box = box
+            survivors.append(track)
+        
+        self.tracks = survivors
+        return self.tracks
+    
+    def reset(self):
+        self.tracks = []
+        self._frames_since_detection = None
+        self._lost = False
+    
+    def _scale_for(self, box):
+        return min(1.0, self.template_width / max(1, box[2]))
+    
+    def _make_template(self, gray, box):
+        x, y, w, h = box
+        scale = self._scale_for(box)
+        crop = gray[max(0, y):y + h, max(0, x):x + w]
+        if crop.size == 0:
+            return None
+        return cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    def _match(self, gray, track):
+        """在轨迹附近的搜索区域中做模板匹配，返回新位置或 None"""
+        if track.template is None:
+            return None
+        
+        x, y, w, h = track.box
+        frame_h, frame_w = gray.shape[:2]
+        mx = int(w * self.search_margin)
+        my = int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+        
+        # 在缩小后的搜索区域上匹配，代价与人脸大小无关
+        scale = self._scale_for(track.box)
+        region = cv2.resize(gray[y0:y1, x0:x1], None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        th, tw = track.template.shape[:2]
+        if region.shape[0] < th or region.shape[1] < tw:
+            return None
+        
+        result = cv2.matchTemplate(region, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(result)
+        if not np.isfinite(score) or score < self.match_threshold:
+            return None
+        
+        new_x = x0 + int(round(loc[0] / scale))
+        new_y = y0 + int(round(loc[1] / scale))
+        return (min(max(0, new_x), frame_w - w), min(max(0, new_y), frame_h - h), w, h)
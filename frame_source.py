@@ -0,0 +1,234 @@
+import cv2
+import os
+import queue
+import threading
+
+# 图片目录帧源支持的扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 缓冲区策略
+DROP_OLDEST = 'drop_oldest'  # 缓冲区满时丢弃最旧的帧（实时源，保证低延迟）
+BLOCK = 'block'              # 缓冲区满时解码线程等待（录像/图片，保证不丢帧）
+
+_END = object()
+
+class FrameSource:
+    """帧源基类
+    
+    后台线程提前解码帧并放入有界缓冲区，检测线程只需从缓冲区取帧。
+    read() / isOpened() / release() 与 cv2.VideoCapture 用法相同，可直接替换。
+    子类实现 _open() / _grab() / _close()。
+    """
+    
+    default_policy = BLOCK
+    
+    def __init__(self, buffer_size=4, policy=None):
+        policy = policy or self.default_policy
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"未知的缓冲区策略: {policy}")
+        
+        self.policy = policy
+        self.fps = 0.0
+        self._buffer = queue.Queue(maxsize=max(1, buffer_size))
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._decoded = 0
+        self._dropped = 0
+        self._finished = False
+        self._thread = None
+        self._opened = self._open()
+        
+        if self._opened:
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+    
+    def isOpened(self):
+        return self._opened
+    
+    def read(self, timeout=None):
+        """读取下一帧，返回 (ret, frame)；帧源结束时返回 (False, None)"""
+        if not self._opened or self._finished:
+            return False, None
+        
+        try:
+            frame = self._buffer.get(timeout=timeout)
+        except queue.Empty:
+            return False, None
+        
+        if frame is _END:
+            self._finished = True
+            return False, None
+        return True, frame
+    
+    def release(self):
+        """停止解码线程并释放资源"""
+        self._stop_event.set()
+        if self._thread is not None:
+            # 清空缓冲区，让阻塞在 put 上的解码线程退出
+            while self._thread.is_alive():
+                self._drain()
+                self._thread.join(0.05)
+            self._thread = None
+        self._drain()
+        if self._opened:
+            self._close()
+            self._opened = False
+    
+    def stats(self):
+        """返回已解码帧数、丢弃帧数及缓冲区中的帧数"""
+        with self._lock:
+            return {
+                'decoded': self._decoded,
+                'dropped': self._dropped,
+                'buffered': self._buffer.qsize(),
+            }
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+    
+    def _drain(self):
+        try:
+            while True:
+                self._buffer.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            frame = self._grab()
+            if frame is None:
+                break
+            with self._lock:
+                self._decoded += 1
+            self._put(frame)
+        self._put(_END)
+    
+    def _put(self, item):
+        if self.policy == DROP_OLDEST:
+            while True:
+                try:
+                    self._buffer.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._buffer.get_nowait()
+                        with self._lock:
+                            self._dropped += 1
+                    except queue.Empty:
+                        pass
+        else:
+            while not self._stop_event.is_set():
+                try:
+                    self._buffer.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+    
+    def _open(self):
+        raise NotImplementedError
+    
+    def _grab(self):
+        """解码下一帧，结束时返回 None"""
+        raise NotImplementedError
+    
+    def _close(self):
+        pass
+
+class VideoCaptureSource(FrameSource):
+    """基于 cv2.VideoCapture 的帧源"""
+    
+    def __init__(self, target, buffer_size=4, policy=None):
+        self.target = target
+        self._cap = None
+        super().__init__(buffer_size, policy)
+    
+    def _open(self):
+        self._cap = cv2.VideoCapture(self.target)
+        if not self._cap.isOpened():
+            return False
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 0.0
+        return True
+    
+    def _grab(self):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+    
+    def _close(self):
+        self._cap.release()
+
+class CameraSource(VideoCaptureSource):
+    """摄像头帧源（默认丢弃旧帧，保证处理的总是最新画面）"""
+    
+    default_policy = DROP_OLDEST
+
+class VideoFileSource(VideoCaptureSource):
+    """视频文件帧源（默认不丢帧，离线处理可全速运行）"""
+    
+    default_policy = BLOCK
+
+class StreamSource(VideoCaptureSource):
+    """网络视频流帧源（RTSP/HTTP 等），断流时自动重连"""
+    
+    default_policy = DROP_OLDEST
+    
+    def __init__(self, url, buffer_size=4, policy=None, reconnect_attempts=3):
+        self.reconnect_attempts = reconnect_attempts
+        super().__init__(url, buffer_size, policy)
+    
+    def _grab(self):
+        frame = super()._grab()
+        attempts = 0
+        while frame is None and attempts < self.reconnect_attempts and not self._stop_event.is_set():
+            attempts += 1
+            print(f"视频流中断，正在重连 ({attempts}/{self.reconnect_attempts}): {self.target}")
+            self._cap.release()
+            if self._open():
+                frame = super()._grab()
+        return frame
+
+class ImageDirSource(FrameSource):
+    """图片目录帧源（按文件名顺序逐张读取）"""
+    
+    default_policy = BLOCK
+    
+    def __init__(self, directory, buffer_size=4, policy=None):
+        self.directory = directory
+        self._paths = []
+        self._index = 0
+        super().__init__(buffer_size, policy)
+    
+    def _open(self):
+        if not os.path.isdir(self.directory):
+            return False
+        self._paths = [os.path.join(self.directory, f) for f in sorted(os.listdir(self.directory))
+                       if f.lower().endswith(IMAGE_EXTENSIONS)]
+        return len(self._paths) > 0
+    
+    def _grab(self):
+        while self._index < len(self._paths):
+            path = self._paths[self._index]
+            self._index += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return frame
+            print(f"跳过无法读取的图片: {path}")
+        return None
+
+def open_source(source=0, buffer_size=4, policy=None):
+    """根据 source 创建帧源
+    
+    source 可以是摄像头索引（整数或数字字符串）、视频文件路径、
+    图片目录或网络视频流地址（rtsp://、http:// 等）。
+    """
+    if isinstance(source, FrameSource):
+        return source
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return CameraSource(int(source), buffer_size, policy)
+    if '://' in source:
+        return StreamSource(source, buffer_size, policy)
+    if os.path.isdir(source):
+        return ImageDirSource(source, buffer_size, policy)
+    return VideoFileSource(source, buffer_size, policy)
@@ -0,0 +1,263 @@
+import os
+import time
+
+import numpy as np
+
+from lbph_model import chi_square_matrix
+
+# 索引文件扩展名（与 .lbph 二进制模型同名存放）
+INDEX_EXT = '.ivf.npz'
+
+# 默认参数：降维后的维数、每次查询探查的倒排列表数、精确重排的候选数
+DEFAULT_COMPONENTS = 128
+DEFAULT_NPROBE = 8
+DEFAULT_RERANK = 64
+
+# 训练 PCA / 聚类时最多使用的样本数
+TRAIN_SAMPLES = 20000
+
+# 投影时每块的直方图数
+PROJECT_BLOCK = 1024
+
+def index_path(model_path):
+    """二进制模型对应的索引文件路径"""
+    return os.path.splitext(model_path)[0] + INDEX_EXT
+
+def _squared_distances(vectors, centers):
+    """两组向量之间的欧氏距离平方，返回 len(vectors)×len(centers)"""
+    result = (np.einsum('ij,ij->i', vectors, vectors)[:, None]
+              - 2.0 * vectors @ centers.T
+              + np.einsum('ij,ij->i', centers, centers)[None, :])
+    return np.maximum(result, 0.0)
+
+def _fit_pca(samples, components, rng, power_iterations=2):
+    """随机化 PCA，返回 (均值, components×D 投影矩阵)"""
+    mean = samples.mean(axis=0)
+    centered = samples - mean
+    rank = min(components + 10, *centered.shape)
+    
+    basis = centered @ rng.standard_normal((centered.shape[1], rank)).astype(np.float32)
+    for _ in range(power_iterations):
+        basis, _ = np.linalg.qr(basis)
+        basis = centered @ (centered.T @ basis)
+    basis, _ = np.linalg.qr(basis)
+    
+    _, _, vt = np.linalg.svd(basis.T @ centered, full_matrices=False)
+    return mean.astype(np.float32), np.ascontiguousarray(vt[:components], dtype=np.float32)
+
+def _fit_kmeans(vectors, lists, rng, iterations=10):
+    """k-means 聚类，返回 lists×k 的聚类中心"""
+    centers = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _squared_distances(vectors, centers).argmin(axis=1)
+        counts = np.bincount(assignment, minlength=lists)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, assignment, vectors)
+        
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+        # 空的聚类重新随机取点
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centers[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centers
+
+class LBPHIndex:
+    """LBPH 训练直方图的近似最近邻索引（PCA 降维 + 倒排文件）
+    
+    直方图先取平方根（卡方距离近似为平方根后的欧氏距离）再用 PCA 降到 components 维，
+    训练集按 k-means 聚成 lists 个倒排列表。查询时只在离查询最近的 nprobe 个列表中
+    按降维距离取前 rerank 个候选，再用原始直方图计算精确卡方距离重排。
+    nprobe / rerank 越大召回率越高、速度越慢；nprobe == lists 时等价于在降维空间中全量扫描。
+    """
+    
+    def __init__(self, model, mean, components, centers, order, offsets, vectors,
+                 nprobe=DEFAULT_NPROBE, rerank=DEFAULT_RERANK):
+        self.model = model
+        self.mean = mean
+        self.components = components
+        self.centers = centers
+        self.order = order
+        self.offsets = offsets
+        self.vectors = vectors
+        self.nprobe = nprobe
+        self.rerank = rerank
+    
+    def __len__(self):
+        return len(self.order)
+    
+    @property
+    def lists(self):
+        return len(self.centers)
+    
+    @classmethod
+    def build(cls, model, components=DEFAULT_COMPONENTS, lists=None, nprobe=DEFAULT_NPROBE,
+              rerank=DEFAULT_RERANK, seed=0):
+        """从 LBPHModel 构建索引；lists 为空时取 sqrt(训练样本数)"""
+        count = len(model)
+        if count == 0:
+            raise ValueError("模型中没有训练样本，无法建立索引")
+        
+        rng = np.random.default_rng(seed)
+        lists = min(count, lists or max(1, int(round(np.sqrt(count)))))
+        
+        sample = np.sort(rng.choice(count, min(count, TRAIN_SAMPLES), replace=False))
+        samples = np.sqrt(model.histogram_rows(sample))
+        mean, projection = _fit_pca(samples, min(components, model.dimension), rng)
+        
+        vectors = np.empty((count, len(projection)), dtype=np.float32)
+        for start in range(0, count, PROJECT_BLOCK):
+            stop = min(start + PROJECT_BLOCK, count)
+            vectors[start:stop] = (np.sqrt(model.histogram_block(start, stop)) - mean) @ projection.T
+        
+        centers = _fit_kmeans(vectors[sample], lists, rng)
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, PROJECT_BLOCK):
+            stop = min(start + PROJECT_BLOCK, count)
+            assignment[start:stop] = _squared_distances(vectors[start:stop], centers).argmin(axis=1)
+        
+        # 倒排列表：order 按列表顺序排列样本下标，offsets[i]:offsets[i+1] 为第 i 个列表
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=lists))
+        
+        return cls(model, mean, projection, centers, order, offsets, vectors[order],
+                   nprobe=nprobe, rerank=rerank)
+    
+    def project(self, histograms):
+        """把 LBPH 直方图投影到降维空间"""
+        return (np.sqrt(np.asarray(histograms, dtype=np.float32)) - self.mean) @ self.components.T
+    
+    def candidates(self, vector, nprobe=None, rerank=None):
+        """在降维空间中查找候选样本，返回训练样本下标（按降维距离升序）"""
+        nprobe = min(nprobe or self.nprobe, self.lists)
+        rerank = rerank or self.rerank
+        
+        center_distances = _squared_distances(vector[None], self.centers)[0]
+        probes = np.argpartition(center_distances, nprobe - 1)[:nprobe] if nprobe < self.lists \
+            else np.arange(self.lists)
+        positions = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes])
+        if len(positions) == 0:
+            return positions
+        
+        distances = _squared_distances(vector[None], self.vectors[positions])[0]
+        if len(positions) > rerank:
+            keep = np.argpartition(distances, rerank - 1)[:rerank]
+            positions, distances = positions[keep], distances[keep]
+        return self.order[positions[np.argsort(distances, kind='stable')]]
+    
+    def predict_batch(self, images, k=1, nprobe=None, rerank=None):
+        """批量识别人脸，返回值与 LBPHModel.predict_batch 相同（距离为精确卡方距离）"""
+        histograms = self.model.histograms_of(images)
+        vectors = self.project(histograms)
+        
+        results = []
+        for histogram, vector in zip(histograms, vectors):
+            indices = np.sort(self.candidates(vector, nprobe, rerank))
+            if len(indices) == 0:
+                results.append([])
+                continue
+            
+            distances = chi_square_matrix(self.model.histogram_rows(indices), histogram[None])[:, 0]
+            labels = self.model.labels[indices]
+            
+            # 每个标签只保留最小距离
+            ranked = np.argsort(distances, kind='stable')
+            _, first = np.unique(labels[ranked], return_index=True)
+            best = ranked[np.sort(first)][:k]
+            results.append([(int(labels[i]), float(distances[i])) for i in best])
+        return results
+    
+    def predict(self, image):
+        """识别一张人脸，返回 (label, distance)，与 LBPHModel.predict 接口相同"""
+        result = self.predict_batch([image])[0]
+        return result[0] if result else (-1, float('inf'))
+    
+    def save(self, path):
+        """保存索引（不含模型本身，加载时需要传入同一个模型）"""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components, centers=self.centers,
+                 order=self.order, offsets=self.offsets, vectors=self.vectors,
+                 settings=np.array([len(self.model), self.nprobe, self.rerank], dtype=np.int64))
+        os.replace(tmp_path, path)
+
+def load_index(path, model):
+    """加载索引；索引与模型的样本数不一致（模型已重新训练）时返回 None"""
+    with np.load(path) as data:
+        count, nprobe, rerank = (int(v) for v in data['settings'])
+        if count != len(model):
+            print(f"警告：索引 {path} 与模型不匹配，请重新建立索引")
+            return None
+        return LBPHIndex(model, data['mean'], data['components'], data['centers'],
+                         data['order'], data['offsets'], data['vectors'],
+                         nprobe=nprobe, rerank=rerank)
+
+def benchmark_recall(index, images, nprobe_values=(1, 2, 4, 8, 16, 32), rerank=None):
+    """对比索引与暴力搜索，返回每个 nprobe 的 recall@1 和平均每张人脸耗时（秒）
+    
+    recall@1 为索引返回的最佳标签与 LBPHModel 暴力搜索结果一致的比例。
+    """
+    start = time.perf_counter()
+    exact = [result[0][0] if result else None for result in index.model.predict_batch(images)]
+    brute_force_time = (time.perf_counter() - start) / max(1, len(images))
+    
+    rows = []
+    for nprobe in nprobe_values:
+        start = time.perf_counter()
+        approximate = index.predict_batch(images, nprobe=nprobe, rerank=rerank)
+        elapsed = (time.perf_counter() - start) / max(1, len(images))
+        hits = sum(1 for truth, result in zip(exact, approximate)
+                   if result and result[0][0] == truth)
+        rows.append({
+            'nprobe': min(nprobe, index.lists),
+            'recall_at_1': hits / max(1, len(images)),
+            'seconds_per_face': elapsed,
+            'speedup': brute_force_time / elapsed if elapsed > 0 else float('inf'),
+        })
+    return {'brute_force_seconds_per_face': brute_force_time, 'results': rows}
+
+def _sample_queries(count, seed=0):
+    """从已采集的人脸中抽取查询图像，并做随机平移和亮度变化，避免与训练样本完全相同"""
+    import cv2
+    from create_classifier import list_persons, load_person_images
+    from preprocess import preprocess_face
+    
+    rng = np.random.default_rng(seed)
+    images = [image for person in list_persons() for _, image in load_person_images(person)]
+    if not images:
+        return []
+    
+    queries = []
+    for i in rng.choice(len(images), min(count, len(images)), replace=False):
+        image = np.asarray(images[i])
+        dx, dy = rng.integers(-3, 4, size=2)
+        shifted = cv2.warpAffine(image, np.float32([[1, 0, dx], [0, 1, dy]]), image.shape[::-1],
+                                 borderMode=cv2.BORDER_REPLICATE)
+        queries.append(preprocess_face(np.clip(shifted * rng.uniform(0.85, 1.15), 0, 255).astype(np.uint8)))
+    return queries
+
+if __name__ == "__main__":
+    from create_classifier import GALLERY_MODEL_PATH
+    from lbph_model import binary_model_path, load_binary_model
+    
+    model_path = binary_model_path(GALLERY_MODEL_PATH)
+    if not os.path.exists(model_path):
+        print("错误：找不到综合模型的二进制文件，请先训练综合模型")
+    else:
+        model = load_binary_model(model_path)
+        print(f"综合模型共 {len(model)} 个训练样本")
+        
+        lists = input("倒排列表数（直接回车为 sqrt(样本数)）: ").strip()
+        start = time.perf_counter()
+        index = LBPHIndex.build(model, lists=int(lists) if lists else None)
+        index.save(index_path(model_path))
+        print(f"索引建立完成（{index.lists} 个列表），耗时 {time.perf_counter() - start:.1f} 秒，"
+              f"已保存到: {index_path(model_path)}")
+        
+        queries = _sample_queries(200)
+        if queries:
+            report = benchmark_recall(index, queries)
+            print(f"暴力搜索: {report['brute_force_seconds_per_face'] * 1000:.2f} ms/张")
+            for row in report['results']:
+                print(f"nprobe={row['nprobe']:<4} recall@1={row['recall_at_1']:.3f} "
+                      f"{row['seconds_per_face'] * 1000:.2f} ms/张 （加速 {row['speedup']:.1f}x）")
@@ -0,0 +1,386 @@
+import json
+import math
+import os
+import struct
+import sys
+
+import numpy as np
+
+# 二进制模型文件扩展名及文件头标识
+BINARY_MODEL_EXT = '.lbph'
+MAGIC = b'LBPHBIN\x01'
+
+# 数组在文件中的对齐字节数
+ALIGNMENT = 64
+
+# 支持的直方图存储类型：float32 无损；float16 / uint8 为有损量化（uint8 每行带缩放系数）
+HISTOGRAM_DTYPES = ('float32', 'float16', 'uint8')
+
+# 分块保存时每块的直方图数
+DISTANCE_BLOCK = 1024
+
+# 计算卡方距离时每块的训练直方图行数，块和 float32 临时数组可留在 CPU 缓存中
+DISTANCE_ROWS = 16
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def binary_model_path(xml_path):
+    """XML 模型对应的二进制模型路径"""
+    return os.path.splitext(xml_path)[0] + BINARY_MODEL_EXT
+
+def lbp_image(image, radius=1, neighbors=8):
+    """计算扩展LBP编码图，与 OpenCV LBPH 的实现逐位一致
+    
+    image 可以是一张 H×W 图像，也可以是同尺寸的 B×H×W 批量图像。
+    """
+    src = np.asarray(image, dtype=np.float32)
+    rows, cols = src.shape[-2:]
+    center = src[..., radius:rows - radius, radius:cols - radius]
+    codes = np.zeros(center.shape, dtype=np.int32)
+    eps = np.finfo(np.float32).eps
+    
+    for n in range(neighbors):
+        # 采样点坐标及双线性插值权重（与 OpenCV 相同的 float 精度）
+        x = np.float32(radius * math.cos(2.0 * math.pi * n / neighbors))
+        y = np.float32(-radius * math.sin(2.0 * math.pi * n / neighbors))
+        fx, fy = int(math.floor(x)), int(math.floor(y))
+        cx, cy = int(math.ceil(x)), int(math.ceil(y))
+        ty = np.float32(y - fy)
+        tx = np.float32(x - fx)
+        one = np.float32(1)
+        w1 = (one - tx) * (one - ty)
+        w2 = tx * (one - ty)
+        w3 = (one - tx) * ty
+        w4 = tx * ty
+        
+        def shifted(dy, dx):
+            return src[..., radius + dy:rows - radius + dy, radius + dx:cols - radius + dx]
+        
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        codes += ((t > center) | (np.abs(t - center) < eps)).astype(np.int32) << n
+    
+    return codes
+
+def spatial_histogram(codes, num_patterns=256, grid_x=8, grid_y=8):
+    """按网格统计LBP编码直方图并按格子像素数归一化
+    
+    codes 为 h×w 时返回长度 D 的 float32 向量；为 B×h×w 时返回 B×D 矩阵。
+    """
+    single = codes.ndim == 2
+    codes = codes[None] if single else codes
+    batch = codes.shape[0]
+    height = codes.shape[1] // grid_y
+    width = codes.shape[2] // grid_x
+    cell_count = grid_y * grid_x
+    result = np.zeros((batch, cell_count * num_patterns), dtype=np.float32)
+    
+    if height > 0 and width > 0 and batch > 0:
+        cells = codes[:, :grid_y * height, :grid_x * width].reshape(batch, grid_y, height, grid_x, width)
+        cell_ids = (np.arange(batch)[:, None, None, None, None] * cell_count
+                    + np.arange(grid_y)[None, :, None, None, None] * grid_x
+                    + np.arange(grid_x)[None, None, None, :, None])
+        index = (np.broadcast_to(cell_ids, cells.shape) * num_patterns + cells).ravel()
+        counts = np.bincount(index, minlength=batch * cell_count * num_patterns)
+        result[:] = counts.reshape(batch, -1) / np.float32(height * width)
+    
+    return result[0] if single else result
+
+def chi_square(histograms, query):
+    """卡方距离（与 OpenCV HISTCMP_CHISQR_ALT 相同），histograms 为 N×D，query 为 D"""
+    return chi_square_matrix(histograms, np.asarray(query)[None])[:, 0]
+
+def chi_square_matrix(histograms, queries, histogram_sums=None):
+    """N×D 训练直方图与 Q×D 查询直方图两两之间的卡方距离，返回 N×Q 矩阵
+    
+    利用 2(a-b)²/(a+b) = 2(a+b) - 8ab/(a+b)：前一项只需两边的行和（可传入预先算好的
+    训练直方图行和 histogram_sums），后一项只在查询非零的维度上计算。训练直方图每
+    DISTANCE_ROWS 行一块依次与各查询计算，float32 临时数组在各块之间复用。
+    """
+    histograms = np.asarray(histograms)
+    queries = np.asarray(queries, dtype=np.float32)
+    if histogram_sums is None:
+        histogram_sums = histograms.sum(axis=1, dtype=np.float64)
+    result = 2.0 * (np.asarray(histogram_sums, dtype=np.float64)[:, None]
+                    + queries.sum(axis=1, dtype=np.float64)[None, :])
+    if len(histograms) == 0 or len(queries) == 0:
+        return result
+    
+    active = [np.flatnonzero(query > 0) for query in queries]
+    values = [query[columns] for query, columns in zip(queries, active)]
+    shape = (min(DISTANCE_ROWS, len(histograms)), max(len(columns) for columns in active))
+    products = np.empty(shape, dtype=np.float32)
+    totals = np.empty(shape, dtype=np.float32)
+    
+    for start in range(0, len(histograms), DISTANCE_ROWS):
+        block = np.asarray(histograms[start:start + DISTANCE_ROWS], dtype=np.float32)
+        rows = len(block)
+        for i, (columns, b) in enumerate(zip(active, values)):
+            a = products[:rows, :len(columns)]
+            total = totals[:rows, :len(columns)]
+            np.take(block, columns, axis=1, out=a)
+            np.add(a, b, out=total)
+            a *= b
+            a /= total
+            result[start:start + rows, i] -= 8.0 * a.sum(axis=1, dtype=np.float64)
+    return result
+
+class LBPHModel:
+    """LBPH 模型（训练直方图 + 标签 + 参数）
+    
+    predict() 与 cv2.face.LBPHFaceRecognizer.predict() 返回相同的 (label, distance)。
+    从二进制文件加载时直方图是只读内存映射，多个进程打开同一模型时共享物理内存页。
+    """
+    
+    def __init__(self, histograms, labels, radius=1, neighbors=8, grid_x=8, grid_y=8,
+                 names=None, scales=None):
+        self.histograms = histograms
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.names = dict(names or {})
+        self.scales = scales
+        self._label_groups = None
+        self._sums = None
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    @property
+    def dimension(self):
+        return self.grid_x * self.grid_y * (1 << self.neighbors)
+    
+    @classmethod
+    def from_recognizer(cls, recognizer, names=None):
+        """从已训练的 OpenCV LBPH 识别器构建模型"""
+        histograms = recognizer.getHistograms()
+        dimension = recognizer.getGridX() * recognizer.getGridY() * (1 << recognizer.getNeighbors())
+        matrix = (np.vstack([h.reshape(1, -1) for h in histograms]).astype(np.float32)
+                  if histograms else np.zeros((0, dimension), dtype=np.float32))
+        return cls(matrix, recognizer.getLabels().ravel(),
+                   radius=recognizer.getRadius(), neighbors=recognizer.getNeighbors(),
+                   grid_x=recognizer.getGridX(), grid_y=recognizer.getGridY(), names=names)
+    
+    def histogram(self, image):
+        """计算一张人脸的LBPH特征直方图"""
+        codes = lbp_image(image, self.radius, self.neighbors)
+        return spatial_histogram(codes, 1 << self.neighbors, self.grid_x, self.grid_y)
+    
+    def histograms_of(self, images):
+        """批量计算人脸直方图，返回 B×D 矩阵；相同尺寸的人脸一起向量化计算"""
+        if isinstance(images, np.ndarray) and images.ndim == 3:
+            codes = lbp_image(images, self.radius, self.neighbors)
+            return spatial_histogram(codes, 1 << self.neighbors, self.grid_x, self.grid_y)
+        
+        result = np.zeros((len(images), self.dimension), dtype=np.float32)
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault(np.shape(image), []).append(i)
+        for indices in groups.values():
+            batch = np.stack([np.asarray(images[i]) for i in indices])
+            result[indices] = self.histograms_of(batch)
+        return result
+    
+    def histogram_block(self, start, stop):
+        """取出 [start, stop) 范围内的训练直方图（量化存储时还原为 float32）"""
+        block = np.asarray(self.histograms[start:stop], dtype=np.float32)
+        if self.scales is not None:
+            block = block * np.asarray(self.scales[start:stop], dtype=np.float32)[:, None]
+        return block
+    
+    def histogram_rows(self, indices):
+        """按下标取出训练直方图（量化存储时还原为 float32）"""
+        indices = np.asarray(indices, dtype=np.int64)
+        rows = np.asarray(self.histograms[indices], dtype=np.float32)
+        if self.scales is not None:
+            rows = rows * np.asarray(self.scales[indices], dtype=np.float32)[:, None]
+        return rows
+    
+    def histogram_sums(self):
+        """每个训练直方图的元素和（卡方距离中与查询无关的部分），首次调用时计算并缓存"""
+        if self._sums is None:
+            self._sums = np.zeros(len(self), dtype=np.float64)
+            for start in range(0, len(self), DISTANCE_BLOCK):
+                stop = min(start + DISTANCE_BLOCK, len(self))
+                self._sums[start:stop] = self.histogram_block(start, stop).sum(axis=1, dtype=np.float64)
+        return self._sums
+    
+    def distance_matrix(self, queries):
+        """Q×D 查询直方图到所有训练直方图的卡方距离，返回 Q×N 矩阵"""
+        queries = np.asarray(queries, dtype=np.float32)
+        if len(queries) == 0 or len(self) == 0:
+            return np.empty((len(queries), len(self)), dtype=np.float64)
+        
+        sums = self.histogram_sums()
+        if self.scales is None:
+            # float32 / float16 存储由 chi_square_matrix 逐块转换，不需要整体还原
+            return chi_square_matrix(self.histograms, queries, sums).T
+        
+        result = np.empty((len(queries), len(self)), dtype=np.float64)
+        step = DISTANCE_ROWS * 4
+        for start in range(0, len(self), step):
+            stop = min(start + step, len(self))
+            result[:, start:stop] = chi_square_matrix(self.histogram_block(start, stop), queries,
+                                                      sums[start:stop]).T
+        return result
+    
+    def distances(self, query):
+        """查询直方图到所有训练直方图的卡方距离"""
+        return self.distance_matrix(np.asarray(query)[None])[0]
+    
+    def predict(self, image):
+        """识别一张人脸，返回 (label, distance)；模型为空时返回 (-1, inf)"""
+        if len(self) == 0:
+            return -1, float('inf')
+        distances = self.distances(self.histogram(image))
+        best = int(np.argmin(distances))
+        return int(self.labels[best]), float(distances[best])
+    
+    def predict_batch(self, images, k=1):
+        """批量识别多张人脸，每张返回按距离升序的前 k 个 [(label, distance), ...]
+        
+        每个标签取其所有训练样本中的最小距离，因此 k 个结果的标签互不相同；
+        每张人脸的第一个结果与 predict() 相同（距离完全相等的不同标签除外）。
+        """
+        if len(images) == 0:
+            return []
+        if len(self) == 0:
+            return [[] for _ in images]
+        
+        distances = self.distance_matrix(self.histograms_of(images))
+        unique_labels, label_distances = self._label_minimum(distances)
+        
+        k = min(k, len(unique_labels))
+        if k < len(unique_labels):
+            top = np.argpartition(label_distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(len(unique_labels)), (len(images), k))
+        
+        results = []
+        for row, candidates in zip(label_distances, top):
+            candidates = candidates[np.argsort(row[candidates], kind='stable')]
+            results.append([(int(unique_labels[c]), float(row[c])) for c in candidates])
+        return results
+    
+    def _label_minimum(self, distances):
+        """按标签归并 Q×N 距离矩阵，返回 (标签数组, Q×L 每个标签的最小距离)"""
+        if self._label_groups is None:
+            order = np.argsort(self.labels, kind='stable')
+            sorted_labels = self.labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            self._label_groups = (order, starts, sorted_labels[starts])
+        order, starts, unique_labels = self._label_groups
+        return unique_labels, np.minimum.reduceat(distances[:, order], starts, axis=1)
+    
+    def save(self, path, dtype='float32'):
+        """保存为二进制模型文件"""
+        save_binary_model(self, path, dtype)
+
+def save_binary_model(model, path, dtype='float32'):
+    """把 LBPH 模型写成二进制文件：文件头（JSON）+ 对齐的标签数组 + 直方图矩阵"""
+    if dtype not in HISTOGRAM_DTYPES:
+        raise ValueError(f"不支持的直方图存储类型: {dtype}")
+    
+    count, dimension = len(model), model.dimension
+    itemsize = np.dtype(dtype).itemsize
+    labels_offset = 0
+    scales_offset = _align(labels_offset + count * 4)
+    histograms_offset = _align(scales_offset + (count * 4 if dtype == 'uint8' else 0))
+    
+    header = json.dumps({
+        'count': count,
+        'dimension': dimension,
+        'dtype': dtype,
+        'byteorder': sys.byteorder,
+        'radius': model.radius,
+        'neighbors': model.neighbors,
+        'grid_x': model.grid_x,
+        'grid_y': model.grid_y,
+        'names': {str(label): name for label, name in model.names.items()},
+        'labels_offset': labels_offset,
+        'scales_offset': scales_offset if dtype == 'uint8' else None,
+        'histograms_offset': histograms_offset,
+    }, ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header))
+    
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        
+        f.seek(data_start + labels_offset)
+        f.write(np.ascontiguousarray(model.labels, dtype=np.int32).tobytes())
+        
+        scales = []
+        f.seek(data_start + histograms_offset)
+        for start in range(0, count, DISTANCE_BLOCK):
+            block = model.histogram_block(start, min(start + DISTANCE_BLOCK, count))
+            if dtype == 'uint8':
+                block_scales = block.max(axis=1) / 255.0
+                block_scales[block_scales == 0] = 1.0
+                scales.append(block_scales.astype(np.float32))
+                block = np.rint(block / block_scales[:, None])
+            f.write(np.ascontiguousarray(block, dtype=dtype).tobytes())
+        
+        # 文件长度补齐到直方图末尾（模型为空时也保证内存映射区域存在）
+        f.truncate(data_start + histograms_offset + count * dimension * itemsize)
+        
+        if dtype == 'uint8' and scales:
+            f.seek(data_start + scales_offset)
+            f.write(np.concatenate(scales).tobytes())
+    
+    os.replace(tmp_path, path)
+
+def load_binary_model(path, mmap=True):
+    """加载二进制模型；mmap=True 时直方图以只读内存映射方式打开，几乎不占用加载时间"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是有效的 LBPH 二进制模型文件: {path}")
+        header_length = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError(f"模型文件的字节序（{header['byteorder']}）与当前平台不一致: {path}")
+    
+    data_start = _align(len(MAGIC) + 4 + header_length)
+    count, dimension = header['count'], header['dimension']
+    
+    def array(offset, dtype, shape):
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        if mmap:
+            return np.memmap(path, dtype=dtype, mode='r', offset=data_start + offset, shape=shape)
+        return np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                           offset=data_start + offset).reshape(shape)
+    
+    labels = np.array(array(header['labels_offset'], np.int32, (count,)))
+    histograms = array(header['histograms_offset'], header['dtype'], (count, dimension))
+    scales = (np.array(array(header['scales_offset'], np.float32, (count,)))
+              if header['scales_offset'] is not None else None)
+    
+    return LBPHModel(histograms, labels,
+                     radius=header['radius'], neighbors=header['neighbors'],
+                     grid_x=header['grid_x'], grid_y=header['grid_y'],
+                     names={int(label): name for label, name in header['names'].items()},
+                     scales=scales)
+
+def export_recognizer(recognizer, path, names=None, dtype='float32'):
+    """把 OpenCV LBPH 识别器导出为二进制模型文件"""
+    model = LBPHModel.from_recognizer(recognizer, names)
+    save_binary_model(model, path, dtype)
+    return model
+
+if __name__ == "__main__":
+    import cv2
+    
+    xml_path = input("请输入要转换的 XML 模型路径: ").strip()
+    dtype = input(f"请选择直方图存储类型 {HISTOGRAM_DTYPES}（直接回车为 float32）: ").strip() or 'float32'
+    
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(xml_path)
+    output_path = binary_model_path(xml_path)
+    export_recognizer(recognizer, output_path, dtype=dtype)
+    print(f"已导出二进制模型: {output_path}")
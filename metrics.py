@@ -0,0 +1,239 @@
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# 性能指标配置（默认关闭；关闭时各计时点几乎没有开销）
+METRICS_CONFIG = {
+    'enabled': False,
+    'host': '127.0.0.1',    # 指标端口只监听本机
+    'port': 9108,           # Prometheus 文本格式 http://host:port/metrics，为 None 时不启动
+    'log_interval': 0.0,    # 大于 0 时每隔该秒数输出一行汇总
+    'window': 1024,         # 每个阶段保留最近多少次耗时用于计算分位数
+}
+
+# 输出的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 计算帧率的时间窗口（秒）
+FPS_WINDOW = 5.0
+
+_NULL_STAGE = nullcontext()
+
+class _Window:
+    """固定长度的滚动样本窗口"""
+    
+    def __init__(self, size):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+    
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+        self.total += value
+    
+    def recent(self):
+        return self.values[:min(self.count, len(self.values))]
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'start')
+    
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+class Metrics:
+    """识别流程各阶段的耗时、计数和状态指标
+    
+    stage(name) 计时一个阶段，保留最近 window 次耗时以计算 p50/p95/p99；
+    mark_frame() 记录处理完成的帧用于计算帧率；
+    register_gauge() 注册在输出时才取值的状态量（如数据库写入队列深度）。
+    """
+    
+    def __init__(self, window=1024):
+        self.window = window
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._gauges = {}
+        self._frames = _Window(window)
+        self._server = None
+        self._log_thread = None
+        self._stop_event = threading.Event()
+    
+    def stage(self, name):
+        """阶段计时上下文；未启用时返回空上下文"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+    
+    def observe(self, name, seconds):
+        """记录一次阶段耗时"""
+        if not self.enabled:
+            return
+        with self._lock:
+            window = self._stages.get(name)
+            if window is None:
+                window = self._stages[name] = _Window(self.window)
+            window.add(seconds)
+    
+    def mark_frame(self):
+        """记录一帧处理完成"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._frames.add(time.monotonic())
+    
+    def register_gauge(self, name, function):
+        """注册状态量，function 在输出指标时调用；function 为 None 时取消注册"""
+        with self._lock:
+            if function is None:
+                self._gauges.pop(name, None)
+            else:
+                self._gauges[name] = function
+    
+    def fps(self):
+        """最近 FPS_WINDOW 秒内的帧率"""
+        with self._lock:
+            times = self._frames.recent()
+        if len(times) < 2:
+            return 0.0
+        now = time.monotonic()
+        recent = np.sort(times[times >= now - FPS_WINDOW])
+        if len(recent) < 2 or recent[-1] <= recent[0]:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0])
+    
+    def snapshot(self):
+        """当前全部指标：{'stages': {name: {...}}, 'gauges', 'frames', 'fps'}"""
+        with self._lock:
+            stages = {}
+            for name, window in self._stages.items():
+                recent = window.recent()
+                stages[name] = {
+                    'count': window.count,
+                    'sum': window.total,
+                    'quantiles': dict(zip(QUANTILES, np.quantile(recent, QUANTILES))) if len(recent) else {},
+                }
+            gauges = dict(self._gauges)
+            frames = self._frames.count
+        
+        values = {}
+        for name, function in gauges.items():
+            try:
+                values[name] = float(function())
+            except Exception:
+                # 状态量来源已失效（如帧源已释放）时跳过
+                continue
+        return {'stages': stages, 'gauges': values, 'frames': frames, 'fps': self.fps()}
+    
+    def prometheus_text(self):
+        """Prometheus 文本格式的指标"""
+        data = self.snapshot()
+        lines = [
+            "# HELP face_stage_seconds Recognition stage latency",
+            "# TYPE face_stage_seconds summary",
+        ]
+        for name, stage in sorted(data['stages'].items()):
+            for quantile, value in stage['quantiles'].items():
+                lines.append(f'face_stage_seconds{{stage="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'face_stage_seconds_sum{{stage="{name}"}} {stage["sum"]:.6f}')
+            lines.append(f'face_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        
+        lines += ["# TYPE face_frames_total counter", f"face_frames_total {data['frames']}",
+                  "# TYPE face_fps gauge", f"face_fps {data['fps']:.3f}"]
+        for name, value in sorted(data['gauges'].items()):
+            lines += [f"# TYPE face_{name} gauge", f"face_{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+    
+    def summary_line(self):
+        """一行汇总：帧率、各阶段 p50/p95（毫秒）及状态量"""
+        data = self.snapshot()
+        parts = [f"fps={data['fps']:.1f}"]
+        for name, stage in data['stages'].items():
+            if stage['quantiles']:
+                parts.append(f"{name}={stage['quantiles'][0.5] * 1000:.1f}/{stage['quantiles'][0.95] * 1000:.1f}ms")
+        parts += [f"{name}={value:g}" for name, value in data['gauges'].items()]
+        return " ".join(parts)
+    
+    def start(self, host='127.0.0.1', port=None, log_interval=0.0):
+        """启用指标收集，并按需启动 HTTP 端点和定时汇总输出"""
+        self.enabled = True
+        self._stop_event.clear()
+        
+        if port is not None and self._server is None:
+            metrics = self
+            
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?', 1)[0] != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = metrics.prometheus_text().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                
+                def log_message(self, *args):
+                    pass
+            
+            try:
+                self._server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as e:
+                print(f"错误：无法启动指标端口 {host}:{port}: {e}")
+            else:
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True).start()
+                print(f"性能指标: http://{host}:{self._server.server_address[1]}/metrics")
+        
+        if log_interval and log_interval > 0 and self._log_thread is None:
+            def log_loop():
+                while not self._stop_event.wait(log_interval):
+                    print(f"[metrics] {self.summary_line()}")
+            
+            self._log_thread = threading.Thread(target=log_loop, name="MetricsLog", daemon=True)
+            self._log_thread.start()
+    
+    def stop(self):
+        """停止收集，关闭 HTTP 端点和定时输出"""
+        self.enabled = False
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._log_thread is not None:
+            self._log_thread.join()
+            self._log_thread = None
+
+# 进程内共享的指标
+metrics = Metrics(METRICS_CONFIG['window'])
+
+def configure_metrics(**options):
+    """修改 METRICS_CONFIG；enabled=True 时立即启动指标收集"""
+    unknown = set(options) - set(METRICS_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的指标配置: {', '.join(sorted(unknown))}")
+    METRICS_CONFIG.update(options)
+    metrics.window = METRICS_CONFIG['window']
+    
+    if METRICS_CONFIG['enabled']:
+        metrics.start(METRICS_CONFIG['host'], METRICS_CONFIG['port'], METRICS_CONFIG['log_interval'])
+    else:
+        metrics.stop()
+
+def stage(name):
+    """阶段计时：with stage('detect'): ..."""
+    return metrics.stage(name)
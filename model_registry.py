@@ -0,0 +1,189 @@
+import cv2
+import os
+import threading
+import time
+from collections import OrderedDict
+from lbph_index import load_index
+from lbph_model import load_binary_model
+
+# 缓存模型的默认内存预算（字节）
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+class _Entry:
+    def __init__(self, model, signature, size, load_time):
+        self.model = model
+        self.signature = signature
+        self.size = size
+        self.load_time = load_time
+        self.hits = 0
+
+class ModelRegistry:
+    """进程内共享的模型缓存
+    
+    人脸检测器和识别模型按 (类型, 绝对路径) 缓存，每次获取时比较文件的修改时间和大小，
+    文件变化后自动重新加载。缓存总大小超过 memory_budget 时按最近最少使用淘汰。
+    """
+    
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        self._evictions = 0
+        self._load_time = 0.0
+    
+    def get_cascade(self, path):
+        """获取 Haar 人脸检测器，文件不存在或无法解析时返回 None"""
+        return self._get('cascade', path, _load_cascade)
+    
+    def get_recognizer(self, path):
+        """获取 LBPH 人脸识别模型，文件不存在时返回 None"""
+        return self._get('recognizer', path, _load_recognizer)
+    
+    def get_binary_model(self, path):
+        """获取 .lbph 二进制识别模型（直方图内存映射），文件不存在时返回 None"""
+        return self._get('binary', path, _load_binary_model)
+    
+    def get_index(self, path, model):
+        """获取二进制模型的近似最近邻索引，文件不存在或与模型不匹配时返回 None"""
+        return self._get('index', path, lambda abspath: _load_index(abspath, model))
+    
+    def invalidate(self, path=None):
+        """移除指定路径（为空时移除全部）的缓存"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            abspath = os.path.abspath(path)
+            for key in [k for k in self._entries if k[1] == abspath]:
+                del self._entries[key]
+    
+    def stats(self):
+        """返回命中/加载次数、淘汰次数、总加载时间及每个模型的加载耗时"""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'reloads': self._reloads,
+                'evictions': self._evictions,
+                'load_time': self._load_time,
+                'memory': sum(e.size for e in self._entries.values()),
+                'memory_budget': self.memory_budget,
+                'models': [{
+                    'kind': kind,
+                    'path': path,
+                    'size': entry.size,
+                    'load_time': entry.load_time,
+                    'hits': entry.hits,
+                } for (kind, path), entry in self._entries.items()],
+            }
+    
+    def _get(self, kind, path, loader):
+        abspath = os.path.abspath(path)
+        try:
+            stat = os.stat(abspath)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = (kind, abspath)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self._hits += 1
+                return entry.model
+            
+            if entry is not None:
+                self._reloads += 1
+            self._misses += 1
+            
+            start = time.perf_counter()
+            model, size = loader(abspath)
+            load_time = time.perf_counter() - start
+            self._load_time += load_time
+            
+            if model is None:
+                self._entries.pop(key, None)
+                return None
+            
+            self._entries[key] = _Entry(model, signature, size, load_time)
+            self._entries.move_to_end(key)
+            self._evict(key)
+            return model
+    
+    def _evict(self, keep):
+        total = sum(e.size for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).size
+            self._evictions += 1
+
+def _load_cascade(path):
+    cascade = cv2.CascadeClassifier(path)
+    if cascade.empty():
+        print(f"错误：无法加载人脸检测器 {path}")
+        return None, 0
+    return cascade, os.path.getsize(path)
+
+def _load_recognizer(path):
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    try:
+        recognizer.read(path)
+    except cv2.error as e:
+        print(f"错误：无法加载识别模型 {path}: {e}")
+        return None, 0
+    # 内存占用按直方图数量 × 每个直方图的 float32 维数估算
+    dimension = recognizer.getGridX() * recognizer.getGridY() * (1 << recognizer.getNeighbors())
+    return recognizer, int(recognizer.getLabels().size) * dimension * 4
+
+def _load_binary_model(path):
+    try:
+        model = load_binary_model(path, mmap=True)
+    except (OSError, ValueError) as e:
+        print(f"错误：无法加载二进制识别模型 {path}: {e}")
+        return None, 0
+    # 直方图是文件映射，由操作系统页缓存管理，只计入常驻的标签和缩放系数
+    size = model.labels.nbytes + (model.scales.nbytes if model.scales is not None else 0)
+    return model, size
+
+def _load_index(path, model):
+    try:
+        index = load_index(path, model)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"错误：无法加载索引 {path}: {e}")
+        return None, 0
+    if index is None:
+        return None, 0
+    size = sum(a.nbytes for a in (index.mean, index.components, index.centers,
+                                   index.order, index.offsets, index.vectors))
+    return index, size
+
+# 进程内共享的模型缓存
+registry = ModelRegistry()
+
+def get_cascade(path):
+    """从共享缓存获取 Haar 人脸检测器"""
+    return registry.get_cascade(path)
+
+def get_recognizer(path):
+    """从共享缓存获取 LBPH 人脸识别模型"""
+    return registry.get_recognizer(path)
+
+def get_binary_model(path):
+    """从共享缓存获取 .lbph 二进制识别模型"""
+    return registry.get_binary_model(path)
+
+def get_index(path, model):
+    """从共享缓存获取近似最近邻索引"""
+    return registry.get_index(path, model)
+
+def registry_stats():
+    """共享模型缓存的统计信息"""
+    return registry.stats()
@@ -0,0 +1,364 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+import cv2
+
+from frame_source import BLOCK, open_source
+from metrics import metrics
+from shm_ring import DEFAULT_FRAME_SHAPE, FrameRing
+
+# 流水线入口策略
+DROP_NEWEST = 'drop_newest'  # 检测队列满时丢弃刚采集的帧（实时源，处理跟不上时降帧）
+
+# 采集进程等待队列时检查退出信号的间隔（秒）
+POLL_INTERVAL = 0.1
+
+def _frame(ring, ref):
+    """队列消息中的帧引用：共享内存槽位号或直接传递的 ndarray"""
+    return ring.view(ref) if isinstance(ref, int) else ref
+
+def _store_frame(ring, frame, sequence, policy, stop_event):
+    """把帧写入共享内存，返回帧引用；DROP_NEWEST 策略下没有空闲槽位时返回 None"""
+    if ring is None or not ring.fits(frame):
+        return frame
+    if policy == DROP_NEWEST:
+        return ring.write(frame, sequence, timeout=0)
+    while not stop_event.is_set():
+        slot = ring.write(frame, sequence, timeout=POLL_INTERVAL)
+        if slot is not None:
+            return slot
+    return None
+
+class ReorderBuffer:
+    """把乱序到达的识别结果按帧序号重新排列
+    
+    push() 放入一个结果，返回此时可以按顺序输出的结果列表；缓存超过 window 个结果仍缺少下一帧时
+    跳过缺失的帧。被跳过的帧之后才到达时不再缓存，直接交给 discard（释放共享内存槽位）并计为迟到。
+    """
+    
+    def __init__(self, window, discard=None):
+        self.window = window
+        self.discard = discard
+        self.next_sequence = 0
+        self.skipped = 0
+        self.late = 0
+        self._pending = {}
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    def push(self, sequence, item):
+        if sequence < self.next_sequence:
+            self.late += 1
+            if self.discard is not None:
+                self.discard(item)
+            return []
+        
+        self._pending[sequence] = item
+        if len(self._pending) > self.window and self.next_sequence not in self._pending:
+            skip_to = min(self._pending)
+            self.skipped += skip_to - self.next_sequence
+            self.next_sequence = skip_to
+        
+        ready = []
+        while self.next_sequence in self._pending:
+            ready.append(self._pending.pop(self.next_sequence))
+            self.next_sequence += 1
+        return ready
+    
+    def drain(self):
+        """按序号取出剩余的全部结果（流水线结束时调用）"""
+        return [self._pending.pop(sequence) for sequence in sorted(self._pending)]
+
+def _capture_worker(source, frames, stop_event, policy, detect_workers, counters, ring):
+    """采集进程：读取帧源，按顺序编号后放入检测队列"""
+    cap = open_source(source)
+    if not cap.isOpened():
+        print(f"错误：无法打开视频源 {source}")
+    else:
+        sequence = 0
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            
+            with counters.get_lock():
+                counters[0] += 1
+            
+            ref = _store_frame(ring, frame, sequence, policy, stop_event)
+            if ref is None:
+                if stop_event.is_set():
+                    break
+                with counters.get_lock():
+                    counters[1] += 1
+                continue
+            
+            if policy == DROP_NEWEST:
+                try:
+                    frames.put_nowait((sequence, ref))
+                except queue.Full:
+                    if isinstance(ref, int):
+                        ring.release(ref)
+                    with counters.get_lock():
+                        counters[1] += 1
+                    continue
+            else:
+                # 阻塞等待下游（背压），期间仍响应退出信号
+                while not stop_event.is_set():
+                    try:
+                        frames.put((sequence, ref), timeout=POLL_INTERVAL)
+                        break
+                    except queue.Full:
+                        continue
+                else:
+                    if isinstance(ref, int):
+                        ring.release(ref)
+                    break
+            sequence += 1
+        cap.release()
+    
+    for _ in range(detect_workers):
+        frames.put(None)
+    if ring is not None:
+        ring.close()
+
+def _detect_worker(options, frames, faces, ring):
+    """检测进程：灰度化并检测人脸"""
+    from Detector import Detector
+    
+    cv2.setNumThreads(1)
+    detector = Detector(**options)
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        sequence, ref = item
+        
+        start = time.perf_counter()
+        gray = cv2.cvtColor(_frame(ring, ref), cv2.COLOR_BGR2GRAY)
+        boxes = [tuple(int(v) for v in box) for box in detector.detect(gray)]
+        faces.put((sequence, ref, boxes, time.perf_counter() - start))
+    if ring is not None:
+        ring.close()
+
+def _recognize_worker(options, person_name, faces, results, ring):
+    """识别进程：对检测到的人脸批量识别"""
+    from Detector import Detector
+    
+    cv2.setNumThreads(1)
+    detector = Detector(**options)
+    recognizer, label_names = detector.load_recognizer(person_name)
+    try:
+        while True:
+            item = faces.get()
+            if item is None:
+                break
+            sequence, ref, boxes, detect_time = item
+            frame = _frame(ring, ref)
+            
+            start = time.perf_counter()
+            face_rois = [cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY) for (x, y, w, h) in boxes]
+            identities = detector.identify_faces(recognizer, label_names, face_rois, person_name)
+            recognize_time = time.perf_counter() - start
+            
+            results.put((sequence, ref, [(box, *identity) for box, identity in zip(boxes, identities)],
+                         detect_time, recognize_time))
+    finally:
+        results.put(None)
+        if ring is not None:
+            ring.close()
+
+class RecognitionPipeline:
+    """多进程识别流水线：采集 → 检测 → 识别 → 输出
+    
+    采集、检测、识别分别在独立进程中运行，各阶段之间是有界队列。
+    policy 为 BLOCK 时下游处理不过来会让采集等待（背压，不丢帧）；
+    为 DROP_NEWEST 时直接丢弃新帧。输出阶段在主进程中按采集顺序重排结果，
+    只有等待超过 reorder_window 帧仍缺失的帧（如工作进程异常退出）才会被跳过。
+    
+    shared_memory=True 时帧写入共享内存缓冲区（FrameRing），队列中只传递槽位号；
+    超过 max_frame_shape 容量的帧仍按值传递。
+    """
+    
+    def __init__(self, person_name=None, source=0, detect_workers=2, recognize_workers=2,
+                 queue_size=8, policy=BLOCK, reorder_window=64, detector_options=None,
+                 shared_memory=True, max_frame_shape=DEFAULT_FRAME_SHAPE):
+        if policy not in (BLOCK, DROP_NEWEST):
+            raise ValueError(f"未知的流水线策略: {policy}")
+        
+        self.person_name = person_name
+        self.source = source
+        self.detect_workers = max(1, detect_workers)
+        self.recognize_workers = max(1, recognize_workers)
+        self.queue_size = queue_size
+        self.policy = policy
+        self.reorder_window = reorder_window
+        self.detector_options = detector_options or {}
+        self.shared_memory = shared_memory
+        self.max_frame_shape = max_frame_shape
+        
+        self._context = mp.get_context()
+        self._stop_event = self._context.Event()
+        self._counters = self._context.Array('q', 2)  # 已采集、入口丢弃
+        self._processes = []
+        self._emitted = 0
+        self._reorder = None
+        self._detect_time = 0.0
+        self._recognize_time = 0.0
+        self._start_time = None
+    
+    def stop(self):
+        """通知采集进程停止，已在流水线中的帧会继续处理完"""
+        self._stop_event.set()
+    
+    def results(self):
+        """启动流水线并按采集顺序逐帧返回 (frame, [((x, y, w, h), name, confidence), ...])"""
+        frames = self._context.Queue(maxsize=self.queue_size)
+        faces = self._context.Queue(maxsize=self.queue_size)
+        results = self._context.Queue(maxsize=self.queue_size)
+        
+        # 槽位数覆盖所有可能同时在途的帧：三个队列、各工作进程正在处理的帧及输出端
+        ring = None
+        reorder_window = self.reorder_window
+        if self.shared_memory:
+            slots = 3 * self.queue_size + self.detect_workers + self.recognize_workers + 2
+            ring = FrameRing(slots, self.max_frame_shape, self._context)
+            reorder_window = min(reorder_window, slots // 2)
+        
+        capture = self._context.Process(
+            target=_capture_worker, name="PipelineCapture", daemon=True,
+            args=(self.source, frames, self._stop_event, self.policy, self.detect_workers, self._counters, ring))
+        detectors = [self._context.Process(
+            target=_detect_worker, name=f"PipelineDetect-{i}", daemon=True,
+            args=(self.detector_options, frames, faces, ring)) for i in range(self.detect_workers)]
+        recognizers = [self._context.Process(
+            target=_recognize_worker, name=f"PipelineRecognize-{i}", daemon=True,
+            args=(self.detector_options, self.person_name, faces, results, ring))
+            for i in range(self.recognize_workers)]
+        self._processes = [capture] + detectors + recognizers
+        
+        metrics.register_gauge('pipeline_dropped_frames', lambda: self._counters[1])
+        self._start_time = time.perf_counter()
+        for process in self._processes:
+            process.start()
+        
+        # 采集和检测全部结束后通知识别进程退出
+        def close_recognizers():
+            for process in [capture] + detectors:
+                process.join()
+            for _ in recognizers:
+                faces.put(None)
+        
+        threading.Thread(target=close_recognizers, name="PipelineCloser", daemon=True).start()
+        
+        finished = 0
+        
+        def release(ref):
+            if isinstance(ref, int):
+                ring.release(ref)
+        
+        reorder = self._reorder = ReorderBuffer(reorder_window, discard=lambda entry: release(entry[0]))
+        
+        def emit(ref, faces_found):
+            # 共享内存中的帧只在下一次取帧前有效，调用方需要保留时应自行复制
+            self._emitted += 1
+            metrics.mark_frame()
+            try:
+                yield _frame(ring, ref), faces_found
+            finally:
+                release(ref)
+        
+        try:
+            while finished < len(recognizers):
+                try:
+                    item = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in recognizers):
+                        print("错误：识别进程已全部退出")
+                        break
+                    continue
+                
+                if item is None:
+                    finished += 1
+                    continue
+                
+                sequence, ref, faces_found, detect_time, recognize_time = item
+                self._detect_time += detect_time
+                self._recognize_time += recognize_time
+                metrics.observe('detect', detect_time)
+                metrics.observe('recognize', recognize_time)
+                for entry in reorder.push(sequence, (ref, faces_found)):
+                    yield from emit(*entry)
+            
+            # 剩余结果按顺序输出
+            for entry in reorder.drain():
+                yield from emit(*entry)
+        finally:
+            metrics.register_gauge('pipeline_dropped_frames', None)
+            self.stop()
+            self._shutdown()
+            if ring is not None:
+                ring.close()
+    
+    def stats(self):
+        """返回已采集、入口丢弃、已输出、重排跳过及跳过后才到达的帧数，平均吞吐（帧/秒）及各阶段平均耗时"""
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+        processed = max(1, self._emitted)
+        return {
+            'captured': self._counters[0],
+            'dropped': self._counters[1],
+            'emitted': self._emitted,
+            'skipped': self._reorder.skipped if self._reorder else 0,
+            'late': self._reorder.late if self._reorder else 0,
+            'fps': self._emitted / elapsed if elapsed > 0 else 0.0,
+            'detect_time': self._detect_time / processed,
+            'recognize_time': self._recognize_time / processed,
+        }
+    
+    def _shutdown(self):
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+def run_pipeline(person_name=None, source=0, display=True, detect_workers=2, recognize_workers=2,
+                 queue_size=8, policy=BLOCK, detector=None):
+    """以流水线模式运行人脸识别，绘制、数据库记录和快照在主进程中完成
+    
+    返回流水线统计信息；识别模型不存在时返回 None。
+    """
+    from Detector import Detector
+    
+    detector = detector or Detector()
+    recognizer, _ = detector.load_recognizer(person_name)
+    if recognizer is None:
+        return None
+    
+    pipeline = RecognitionPipeline(person_name, source, detect_workers, recognize_workers,
+                                   queue_size, policy, detector_options=detector.options())
+    
+    print(f"开始识别 {person_name or '所有人员'}（流水线模式，检测 {pipeline.detect_workers} 进程，"
+          f"识别 {pipeline.recognize_workers} 进程），按 'q' 键退出")
+    
+    for frame, results in pipeline.results():
+        detector.annotate_frame(frame, results)
+        
+        if not display:
+            continue
+        
+        cv2.imshow('Face Recognition', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            pipeline.stop()
+    
+    if display:
+        cv2.destroyAllWindows()
+    
+    stats = pipeline.stats()
+    print(f"流水线：采集 {stats['captured']} 帧，丢弃 {stats['dropped']} 帧，输出 {stats['emitted']} 帧，"
+          f"{stats['fps']:.1f} 帧/秒")
+    detector.print_output_stats()
+    detector.close()
+    return stats
@@ -0,0 +1,162 @@
+import cv2
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from model_registry import get_cascade
+
+# 人脸预处理参数（训练和识别使用同一组参数；修改后已有模型会在下次训练时全量重训）
+PREPROCESS_PARAMS = {
+    'width': 100,           # 统一尺寸，LBP 计算量与之成正比
+    'height': 100,
+    'equalize': 'hist',     # 'hist' 全局直方图均衡，'clahe' 自适应均衡，None 不均衡
+    'align': False,         # 按双眼连线旋转摆正（需要 EYE_CASCADE_PATH）
+}
+
+# 对齐使用的人眼检测器
+EYE_CASCADE_PATH = 'data/haarcascade_eye.xml'
+
+# 训练样本预处理结果缓存目录
+CACHE_DIR = "data/classifiers/preprocessed"
+
+_clahe = None
+_eye_warning_shown = False
+
+def preprocess_params():
+    """当前预处理参数（可 JSON 序列化，记录在训练清单中）"""
+    return dict(PREPROCESS_PARAMS)
+
+def configure_preprocess(**options):
+    """修改 PREPROCESS_PARAMS"""
+    unknown = set(options) - set(PREPROCESS_PARAMS)
+    if unknown:
+        raise ValueError(f"未知的预处理参数: {', '.join(sorted(unknown))}")
+    if options.get('equalize', 'hist') not in ('hist', 'clahe', None):
+        raise ValueError(f"未知的均衡方式: {options['equalize']}")
+    PREPROCESS_PARAMS.update(options)
+
+def _eye_angle(face):
+    """检测双眼，返回双眼连线的倾斜角度（度）及旋转中心；检测不到两只眼睛时返回 None"""
+    global _eye_warning_shown
+    
+    eye_cascade = get_cascade(EYE_CASCADE_PATH)
+    if eye_cascade is None:
+        if not _eye_warning_shown:
+            print(f"警告：找不到人眼检测器文件 {EYE_CASCADE_PATH}，跳过人脸对齐")
+            _eye_warning_shown = True
+        return None
+    
+    # 眼睛只在人脸上半部分查找
+    height, width = face.shape[:2]
+    upper = face[:height // 2]
+    eyes = eye_cascade.detectMultiScale(upper, scaleFactor=1.1, minNeighbors=5,
+                                        minSize=(max(1, width // 10), max(1, width // 10)))
+    if len(eyes) < 2:
+        return None
+    
+    # 取面积最大的两个，且分别位于人脸左右两侧
+    eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+    (x1, y1), (x2, y2) = sorted((x + w / 2, y + h / 2) for x, y, w, h in eyes)
+    if x1 >= width / 2 or x2 <= width / 2:
+        return None
+    
+    angle = float(np.degrees(np.arctan2(y2 - y1, x2 - x1)))
+    return angle, ((x1 + x2) / 2, (y1 + y2) / 2)
+
+def preprocess_face(face_gray, params=None):
+    """人脸灰度图的统一预处理：（可选）对齐 → 缩放为固定尺寸 → 亮度均衡，返回 uint8 数组"""
+    params = params or PREPROCESS_PARAMS
+    face = np.ascontiguousarray(face_gray, dtype=np.uint8)
+    
+    if params['align']:
+        found = _eye_angle(face)
+        if found is not None:
+            angle, center = found
+            matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+            face = cv2.warpAffine(face, matrix, face.shape[::-1], flags=cv2.INTER_LINEAR,
+                                  borderMode=cv2.BORDER_REPLICATE)
+    
+    size = (params['width'], params['height'])
+    if face.shape[::-1] != size:
+        interpolation = cv2.INTER_AREA if face.shape[1] > size[0] else cv2.INTER_LINEAR
+        face = cv2.resize(face, size, interpolation=interpolation)
+    
+    if params['equalize'] == 'hist':
+        face = cv2.equalizeHist(face)
+    elif params['equalize'] == 'clahe':
+        face = _get_clahe().apply(face)
+    return face
+
+def _get_clahe():
+    global _clahe
+    if _clahe is None:
+        _clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return _clahe
+
+class FaceCache:
+    """训练样本预处理结果的磁盘缓存
+    
+    以样本内容哈希和预处理参数为键，每个样本保存为一个 .npy 文件；
+    样本没有变化时重新训练直接读取缓存，不再解码原图和重复预处理。
+    """
+    
+    def __init__(self, directory=CACHE_DIR, params=None):
+        self.directory = directory
+        self.params = dict(params or PREPROCESS_PARAMS)
+        self._params_key = json.dumps(self.params, sort_keys=True)
+    
+    def path(self, sample_hash):
+        key = hashlib.sha1(f"{sample_hash}:{self._params_key}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+    
+    def get(self, sample_hash):
+        """读取缓存的预处理结果，不存在或损坏时返回 None"""
+        path = self.path(sample_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+    
+    def put(self, sample_hash, face):
+        """写入预处理结果（先写临时文件再替换，多个训练进程同时写入不会读到半个文件）"""
+        path = self.path(sample_hash)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, face)
+        os.replace(tmp_path, path)
+    
+    def prune(self, sample_hashes):
+        """删除 sample_hashes（按当前参数）以外的缓存文件，返回删除的文件数"""
+        if not os.path.isdir(self.directory):
+            return 0
+        
+        keep = {os.path.basename(self.path(digest)) for digest in sample_hashes}
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.npy') and name not in keep:
+                    try:
+                        os.remove(os.path.join(root, name))
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+    
+    def load(self, sample_hashes, load_images):
+        """按样本哈希取得预处理后的人脸
+        
+        load_images(positions) 只对缓存未命中的样本调用，返回对应的原始灰度图列表。
+        """
+        faces = [self.get(digest) for digest in sample_hashes]
+        missing = [i for i, face in enumerate(faces) if face is None]
+        if missing:
+            for i, image in zip(missing, load_images(missing)):
+                faces[i] = preprocess_face(image, self.params)
+                self.put(sample_hashes[i], faces[i])
+        return faces
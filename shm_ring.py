@@ -0,0 +1,142 @@
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 每个槽位的头部字段：序号、引用计数、维数、形状（最多 3 维）
+_SEQUENCE, _REFCOUNT, _NDIM, _SHAPE = 0, 1, 2, 3
+HEADER_FIELDS = 6
+
+# 槽位按内存页对齐
+SLOT_ALIGNMENT = 4096
+
+# 默认槽位容量：1080p BGR 帧
+DEFAULT_FRAME_SHAPE = (1080, 1920, 3)
+
+def _align(size):
+    return (size + SLOT_ALIGNMENT - 1) // SLOT_ALIGNMENT * SLOT_ALIGNMENT
+
+class FrameRing:
+    """共享内存帧缓冲区
+    
+    预先分配 slots 个固定容量的帧槽位，生产者把帧写入空闲槽位后只需在进程间传递槽位号，
+    消费者通过 view() 直接得到共享内存上的 ndarray，不经过序列化和复制。
+    每个槽位带序号和引用计数，引用计数归零后槽位才会被重新使用。
+    FrameRing 对象可以作为参数传给子进程，子进程中自动连接到同一块共享内存。
+    """
+    
+    def __init__(self, slots, frame_shape=DEFAULT_FRAME_SHAPE, context=None):
+        context = context or mp.get_context()
+        self.slots = slots
+        self.slot_bytes = _align(int(np.prod(frame_shape)))
+        self._header_bytes = _align(slots * HEADER_FIELDS * 8)
+        self._condition = context.Condition()
+        self._shm = shared_memory.SharedMemory(create=True, size=self._header_bytes + slots * self.slot_bytes)
+        self._owner_pid = os.getpid()
+        self._attach()
+        
+        self._header[:] = 0
+        self._header[:, _SEQUENCE] = -1
+    
+    def __getstate__(self):
+        return {
+            'name': self._shm.name,
+            'slots': self.slots,
+            'slot_bytes': self.slot_bytes,
+            'header_bytes': self._header_bytes,
+            'condition': self._condition,
+        }
+    
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slot_bytes = state['slot_bytes']
+        self._header_bytes = state['header_bytes']
+        self._condition = state['condition']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner_pid = None
+        self._attach()
+    
+    def _attach(self):
+        self._header = np.ndarray((self.slots, HEADER_FIELDS), dtype=np.int64, buffer=self._shm.buf)
+        self._data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8,
+                                buffer=self._shm.buf, offset=self._header_bytes)
+    
+    def fits(self, frame):
+        """帧是否能放入一个槽位"""
+        return frame.dtype == np.uint8 and frame.ndim <= 3 and frame.nbytes <= self.slot_bytes
+    
+    def write(self, frame, sequence, readers=1, timeout=None):
+        """把帧写入空闲槽位，返回槽位号
+        
+        没有空闲槽位时最多等待 timeout 秒（None 为一直等待，0 为不等待），
+        超时或帧超出槽位容量时返回 None。readers 为初始引用计数。
+        """
+        if not self.fits(frame):
+            return None
+        
+        with self._condition:
+            slot = self._free_slot()
+            if slot is None and timeout != 0:
+                self._condition.wait_for(lambda: self._free_slot() is not None, timeout)
+                slot = self._free_slot()
+            if slot is None:
+                return None
+            
+            header = self._header[slot]
+            header[_REFCOUNT] = readers
+            header[_SEQUENCE] = sequence
+            header[_NDIM] = frame.ndim
+            header[_SHAPE:_SHAPE + 3] = frame.shape + (1,) * (3 - frame.ndim)
+        
+        # 槽位已被占用（引用计数 > 0），复制数据不需要持有锁
+        self._data[slot, :frame.nbytes] = frame.reshape(-1)
+        return slot
+    
+    def view(self, slot):
+        """槽位中帧的 ndarray 视图（共享内存，不复制）"""
+        header = self._header[slot]
+        shape = tuple(int(v) for v in header[_SHAPE:_SHAPE + int(header[_NDIM])])
+        return self._data[slot, :int(np.prod(shape))].reshape(shape)
+    
+    def sequence(self, slot):
+        return int(self._header[slot, _SEQUENCE])
+    
+    def retain(self, slot, count=1):
+        """增加引用计数（帧交给更多消费者时调用）"""
+        with self._condition:
+            self._header[slot, _REFCOUNT] += count
+    
+    def release(self, slot):
+        """释放一个引用，引用计数归零时槽位可以被重新写入"""
+        with self._condition:
+            header = self._header[slot]
+            if header[_REFCOUNT] > 0:
+                header[_REFCOUNT] -= 1
+            if header[_REFCOUNT] == 0:
+                self._condition.notify_all()
+    
+    def in_use(self):
+        """正在使用的槽位数"""
+        with self._condition:
+            return int(np.count_nonzero(self._header[:, _REFCOUNT]))
+    
+    def close(self):
+        """断开共享内存；创建者同时删除共享内存（fork 出的子进程继承的对象不会删除）"""
+        if self._shm is None:
+            return
+        self._header = None
+        self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有外部持有的视图，映射在进程退出时释放
+            pass
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
+        self._shm = None
+    
+    def _free_slot(self):
+        # 总是取编号最小的空闲槽位，实际被使用（占用物理内存）的槽位数与并发帧数相当
+        free = np.flatnonzero(self._header[:, _REFCOUNT] == 0)
+        return int(free[0]) if len(free) else None
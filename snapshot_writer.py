@@ -0,0 +1,134 @@
+import cv2
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from metrics import metrics
+
+# 快照保存模式
+SNAPSHOT_FACE = 'face'    # 只保存人脸区域
+SNAPSHOT_FRAME = 'frame'  # 保存整帧画面
+
+class SnapshotWriter:
+    """识别结果快照的后台保存器
+    
+    识别循环只负责截取图像并放入有界队列，JPEG 编码和写盘由后台线程完成。
+    同一人员在 cooldown 秒内只保存一张快照；队列已满时丢弃快照并计数。
+    """
+    
+    def __init__(self, save_dir="recognition_results", mode=SNAPSHOT_FACE, cooldown=5.0,
+                 workers=2, max_pending=32, jpeg_quality=90):
+        if mode not in (SNAPSHOT_FACE, SNAPSHOT_FRAME):
+            raise ValueError(f"未知的快照模式: {mode}")
+        
+        self.save_dir = save_dir
+        self.mode = mode
+        self.cooldown = cooldown
+        self.jpeg_quality = jpeg_quality
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._last_saved = {}
+        self._sequence = 0
+        self._saved = 0
+        self._dropped = 0
+        self._throttled = 0
+        self._failed = 0
+        self._closed = False
+        
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        
+        self._workers = [threading.Thread(target=self._run, name=f"SnapshotWriter-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+        metrics.register_gauge('snapshot_pending', self._queue.qsize)
+    
+    def submit(self, frame, person_name, confidence, box=None):
+        """提交一张快照，返回是否已放入队列
+        
+        冷却时间内的重复快照和队列满时的快照都会被跳过，不会阻塞调用方。
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                return False
+            last = self._last_saved.get(person_name)
+            if last is not None and now - last < self.cooldown:
+                self._throttled += 1
+                return False
+        
+        # 截取（复制）图像，调用方之后可以继续在原帧上绘制
+        if self.mode == SNAPSHOT_FACE and box is not None:
+            x, y, w, h = box
+            image = frame[max(0, y):y + h, max(0, x):x + w].copy()
+        else:
+            image = frame.copy()
+        
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        filename = f"{self.save_dir}/{person_name}_{confidence:.1f}_{timestamp}_{sequence}.jpg"
+        
+        try:
+            self._queue.put_nowait((filename, image))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        
+        with self._lock:
+            self._last_saved[person_name] = now
+        return True
+    
+    def flush(self):
+        """等待队列中的快照全部写完"""
+        self._queue.join()
+    
+    def close(self):
+        """写完队列中剩余的快照后停止后台线程；之后提交的快照直接跳过"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # 每个线程取到一个结束标记后退出，标记排在已提交的快照之后
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        metrics.register_gauge('snapshot_pending', None)
+    
+    def stats(self):
+        """返回已保存、丢弃（队列满）、冷却跳过、失败的快照数及待写入数"""
+        with self._lock:
+            return {
+                'saved': self._saved,
+                'dropped': self._dropped,
+                'throttled': self._throttled,
+                'failed': self._failed,
+                'pending': self._queue.qsize(),
+            }
+    
+    def _run(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            filename, image = item
+            try:
+                with metrics.stage('snapshot_write'):
+                    ok = cv2.imwrite(filename, image, params)
+            except cv2.error:
+                ok = False
+            
+            with self._lock:
+                if ok:
+                    self._saved += 1
+                else:
+                    self._failed += 1
+            self._queue.task_done()
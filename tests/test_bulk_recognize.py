@@ -0,0 +1,70 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import bulk_recognize
+import Detector
+
+
+class _FakeDetector:
+    def __init__(self, **options):
+        pass
+    
+    def load_recognizer(self, person_name=None):
+        return object(), None
+
+
+def _raise(paths):
+    raise RuntimeError("worker failed")
+
+
+def _crash(paths):
+    os._exit(1)
+
+
+def _no_faces(paths):
+    return [(path, [], None) for path in paths]
+
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    monkeypatch.setattr(Detector, 'Detector', _FakeDetector)
+    directory = tmp_path / "images"
+    directory.mkdir()
+    paths = []
+    for i in range(3):
+        path = str(directory / f"{i}.png")
+        cv2.imwrite(path, np.zeros((8, 8), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize('worker', [_raise, _crash])
+def test_failed_chunk_units_are_listed_and_not_completed(images, tmp_path, monkeypatch, worker):
+    monkeypatch.setattr(bulk_recognize, '_process_images', worker)
+    output = str(tmp_path / "out.jsonl")
+    
+    stats = bulk_recognize.bulk_recognize([os.path.dirname(images[0])], output, workers=1, chunk_size=2)
+    
+    assert sorted(stats['failed']) == sorted(images)
+    assert stats['errors'] == len(images)
+    with open(output + bulk_recognize.PROGRESS_EXT, encoding='utf-8') as f:
+        assert f.read() == ""
+    with open(output + bulk_recognize.ERRORS_EXT, encoding='utf-8') as f:
+        assert sorted(line.split('\t')[0] for line in f) == sorted(images)
+
+
+def test_failed_units_are_retried_on_resume(images, tmp_path, monkeypatch):
+    output = str(tmp_path / "out.jsonl")
+    monkeypatch.setattr(bulk_recognize, '_process_images', _raise)
+    bulk_recognize.bulk_recognize([os.path.dirname(images[0])], output, workers=1)
+    
+    monkeypatch.setattr(bulk_recognize, '_process_images', _no_faces)
+    stats = bulk_recognize.bulk_recognize([os.path.dirname(images[0])], output, workers=1)
+    
+    assert stats['skipped'] == 0
+    assert stats['units'] == len(images)
+    assert stats['failed'] == []
+    assert not os.path.exists(output + bulk_recognize.ERRORS_EXT)
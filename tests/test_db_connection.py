@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+from mysql.connector import Error
+
+import db_connection
+
+
+class _DeadConnection:
+    def __init__(self):
+        self.closed = False
+    
+    def ping(self, reconnect=False):
+        raise Error("gone away")
+    
+    def reconnect(self, attempts=1, delay=0):
+        raise Error("cannot reconnect")
+    
+    def close(self):
+        self.closed = True
+
+
+def test_failed_health_check_closes_connection():
+    pool = db_connection.ConnectionPool({}, pool_size=1, ping_interval=0.0)
+    raw = _DeadConnection()
+    entry = db_connection._PoolEntry(raw)
+    entry.last_used = time.monotonic() - 1.0
+    pool._idle.append(entry)
+    pool._created = 1
+    
+    assert pool.get(timeout=0.1) is None
+    assert raw.closed
+    stats = pool.stats()
+    assert stats['created'] == 0
+    assert stats['in_use'] == 0
+    assert stats['discarded'] == 1
+
+
+class _ExportCursor:
+    def __init__(self, error):
+        self.error = error
+        self.closed = False
+        self.batches = 0
+    
+    def execute(self, query, params):
+        pass
+    
+    def fetchmany(self, size):
+        self.batches += 1
+        if self.batches > 1:
+            raise self.error
+        return [(i, 'user', 'alice', '2026-01-01 00:00:00', 50.0) for i in range(size)]
+    
+    def close(self):
+        self.closed = True
+        raise Error("Unread result found")
+
+
+class _ExportConnection:
+    def __init__(self, error):
+        self.cursor_object = _ExportCursor(error)
+        self.closed = False
+    
+    def cursor(self, buffered=True):
+        return self.cursor_object
+    
+    def close(self):
+        self.closed = True
+
+
+def _export(tmp_path, monkeypatch, error):
+    connection = _ExportConnection(error)
+    monkeypatch.setattr(db_connection, '_export_connection', lambda: connection)
+    monkeypatch.setattr(os, 'getpid', lambda: 1234)
+    path = str(tmp_path / "records.csv")
+    return connection, path, lambda: db_connection.export_recognition_records(path, batch_size=10)
+
+
+def test_export_failure_closes_cursor_and_connection(tmp_path, monkeypatch):
+    connection, path, export = _export(tmp_path, monkeypatch, Error("lost connection"))
+    
+    assert export() is None
+    assert connection.cursor_object.closed
+    assert connection.closed
+    assert os.listdir(tmp_path) == []
+
+
+def test_unexpected_export_error_still_cleans_up(tmp_path, monkeypatch):
+    connection, path, export = _export(tmp_path, monkeypatch, KeyboardInterrupt())
+    
+    with pytest.raises(KeyboardInterrupt):
+        export()
+    assert connection.cursor_object.closed
+    assert connection.closed
+    assert os.listdir(tmp_path) == []
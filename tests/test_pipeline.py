@@ -0,0 +1,52 @@
+from pipeline import ReorderBuffer
+
+
+def test_in_order_results_pass_through():
+    reorder = ReorderBuffer(4)
+    assert [reorder.push(i, i) for i in range(3)] == [[0], [1], [2]]
+    assert reorder.skipped == 0 and reorder.late == 0
+
+
+def test_out_of_order_results_are_reordered():
+    reorder = ReorderBuffer(4)
+    assert reorder.push(2, 'c') == []
+    assert reorder.push(1, 'b') == []
+    assert reorder.push(0, 'a') == ['a', 'b', 'c']
+    assert len(reorder) == 0
+
+
+def test_window_overflow_skips_missing_frame():
+    reorder = ReorderBuffer(2)
+    assert reorder.push(1, 1) == []
+    assert reorder.push(2, 2) == []
+    assert reorder.push(3, 3) == [1, 2, 3]
+    assert reorder.skipped == 1
+    assert reorder.next_sequence == 4
+
+
+def test_late_result_after_skip_is_discarded():
+    discarded = []
+    reorder = ReorderBuffer(2, discard=discarded.append)
+    for sequence in (1, 2, 3):
+        reorder.push(sequence, sequence)
+    
+    # 帧 0 已被跳过，迟到后直接丢弃，不占用缓存，也不会让序号倒退
+    assert reorder.push(0, 0) == []
+    assert discarded == [0]
+    assert reorder.late == 1
+    assert len(reorder) == 0
+    
+    # 再次溢出时仍只向前跳过
+    assert reorder.push(5, 5) == []
+    assert reorder.push(6, 6) == []
+    assert reorder.push(7, 7) == [5, 6, 7]
+    assert reorder.skipped == 2
+    assert reorder.next_sequence == 8
+
+
+def test_drain_returns_remaining_in_order():
+    reorder = ReorderBuffer(8)
+    for sequence in (4, 2, 3):
+        reorder.push(sequence, sequence)
+    assert reorder.drain() == [2, 3, 4]
+    assert len(reorder) == 0